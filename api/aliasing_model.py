@@ -1,34 +1,151 @@
+import hashlib
+import re
+from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
+
 import nltk
-from flair.data import Sentence
-from flair.models import SequenceTagger
 
+from .config import SEGMENT_MAX_TOKENS
+from .config import SEGMENT_OVERLAP_TOKENS
 
-def get_entities(
-    tagger: SequenceTagger,
+if TYPE_CHECKING:
+    from flair.models import SequenceTagger
+
+
+# sentence ends not followed by a space, as in "...in Ukraine.In an internal post"
+MISSING_SPACE_PATTERN = re.compile(r"(?<=[a-z][.!?])(?=[A-Z])")
+
+
+def segment_text(
     raw_text: str,
-    aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
-) -> dict:
-    """Returns a dictionary of named entities with a unique ID
+    max_tokens: int = SEGMENT_MAX_TOKENS,
+    overlap: int = SEGMENT_OVERLAP_TOKENS,
+) -> List[str]:
+    """Splits a text into sentences of at most max_tokens tokens
+
+    Missing spaces after sentence ends are repaired before splitting and longer
+    sentences are split into overlapping windows so that entities on a window
+    boundary are still found.
+
+    Args:
+        raw_text (str): text to split
+        max_tokens (int, optional): maximum number of (whitespace separated)
+            tokens of a chunk. Defaults to SEGMENT_MAX_TOKENS.
+        overlap (int, optional): number of tokens shared by consecutive windows.
+            Defaults to SEGMENT_OVERLAP_TOKENS.
+
+    Returns:
+        List[str]: chunks of the text
+
+    Raises:
+        ValueError: if overlap is negative or not smaller than max_tokens
+    """
+    if not 0 <= overlap < max_tokens:
+        raise ValueError(
+            f"The overlap ({overlap}) must be at least 0 and smaller than max_tokens "
+            f"({max_tokens})."
+        )
+
+    chunks = []
+    step = max_tokens - overlap
+
+    for sentence in nltk.sent_tokenize(MISSING_SPACE_PATTERN.sub(" ", raw_text)):
+        tokens = sentence.split()
+        if len(tokens) <= max_tokens:
+            chunks.append(sentence)
+            continue
+        start = 0
+        while True:
+            end = min(start + max_tokens, len(tokens))
+            chunks.append(" ".join(tokens[start:end]))
+            # the last window ends with the sentence
+            if end == len(tokens):
+                break
+            start += step
+
+    return chunks
+
+
+def get_sentence_key(sentence: str) -> str:
+    """Returns a digest of the sentence with normalized whitespaces
+
+    Args:
+        sentence (str): sentence to hash
+
+    Returns:
+        str: hexadecimal digest
+    """
+    normalized_sentence = " ".join(sentence.split())
+    return hashlib.blake2b(
+        normalized_sentence.encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def tag_sentences(
+    tagger: "SequenceTagger",
+    sentences: List[str],
+    sentence_cache=None,
+    mini_batch_size: int = 32,
+) -> List[dict]:
+    """Returns the named entities of each sentence
+
+    Identical sentences only go through the tagger once and, when a cache is
+    given, sentences that were already tagged are not sent to the tagger.
 
     Args:
         tagger (SequenceTagger): Flair SequenceTagger to perform NER
-        raw_text (str): Sentence to alias
-        aliases_to_anonymize (list, optional): List of aliases to keep.
-            Defaults to ["LOC", "PER", "ORG"].
+        sentences (List[str]): sentences to tag
+        sentence_cache (ResultCache, optional): cache of the entities of
+            sentences, keyed by get_sentence_key. Defaults to None.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to 32.
 
     Returns:
-        dict: dictionary with unique entities as keys and unique alias as values
+        List[dict]: for each sentence, a dictionary with named entities as keys
+            and tags as values
     """
-    texts = [Sentence(s) for s in nltk.sent_tokenize(raw_text)]
+    from flair.data import Sentence
 
-    tagger.predict(texts)
+    results = [None] * len(sentences)
+    sentences_to_tag = {}
 
-    entities = {}
+    for index, sentence in enumerate(sentences):
+        key = get_sentence_key(sentence)
+        if sentence_cache is not None:
+            entities = sentence_cache.get(key)
+            if entities is not None:
+                results[index] = entities
+                continue
+        sentences_to_tag.setdefault(key, []).append(index)
+
+    texts = [Sentence(sentences[indices[0]]) for indices in sentences_to_tag.values()]
 
-    for s in texts:
+    if texts:
+        tagger.predict(texts, mini_batch_size=mini_batch_size)
+
+    for (key, indices), s in zip(sentences_to_tag.items(), texts):
+        entities = {}
         for entity in s.get_spans("ner"):
             entities[entity.text] = entity.tag
+        if sentence_cache is not None:
+            sentence_cache.set(key, entities)
+        for index in indices:
+            results[index] = entities
+
+    return results
+
+
+def alias_entities(entities: dict, aliases_to_anonymize: list) -> dict:
+    """Replaces, in place, the tags of the entities to anonymize with unique ids
 
+    Args:
+        entities (dict): dictionary with named entities as keys and tags as values
+        aliases_to_anonymize (list): List of aliases to anonymize.
+
+    Returns:
+        dict: dictionary with unique entities as keys and unique alias as values
+    """
     alias_counter = {}
 
     for text, alias in entities.items():
@@ -39,8 +156,219 @@ def get_entities(
     return entities
 
 
+def merge_sentence_entities(
+    sentence_entities: List[dict], aliases_to_anonymize: list
+) -> dict:
+    """Returns the entities of a text from the entities of its sentences, with
+    aliases numbered in order of appearance
+
+    Args:
+        sentence_entities (List[dict]): entities of each sentence of the text
+        aliases_to_anonymize (list): List of aliases to anonymize.
+
+    Returns:
+        dict: dictionary with unique entities as keys and unique alias as values
+    """
+    entities = {}
+    for e in sentence_entities:
+        entities.update(e)
+    return alias_entities(entities, aliases_to_anonymize)
+
+
+def get_entities_batch(
+    tagger: "SequenceTagger",
+    raw_texts: List[str],
+    aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
+    sentence_cache=None,
+    mini_batch_size: int = 32,
+) -> List[dict]:
+    """Returns a dictionary of named entities with a unique ID for each text
+
+    The sentences of all the texts are tagged together while aliases are
+    numbered independently for each text.
+
+    Args:
+        tagger (SequenceTagger): Flair SequenceTagger to perform NER
+        raw_texts (List[str]): texts to alias
+        aliases_to_anonymize (list, optional): List of aliases to keep.
+            Defaults to ["LOC", "PER", "ORG"].
+        sentence_cache (ResultCache, optional): cache of the entities of
+            sentences, see tag_sentences. Defaults to None.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to 32.
+
+    Returns:
+        List[dict]: for each text, dictionary with unique entities as keys and
+            unique alias as values
+    """
+    sentences_per_text = [segment_text(raw_text) for raw_text in raw_texts]
+
+    tagged_sentences = tag_sentences(
+        tagger=tagger,
+        sentences=[s for sentences in sentences_per_text for s in sentences],
+        sentence_cache=sentence_cache,
+        mini_batch_size=mini_batch_size,
+    )
+
+    results = []
+    position = 0
+
+    for sentences in sentences_per_text:
+        end = position + len(sentences)
+        results.append(
+            merge_sentence_entities(
+                tagged_sentences[position:end], aliases_to_anonymize
+            )
+        )
+        position = end
+
+    return results
+
+
+def get_entities_incremental_batch(
+    tagger: "SequenceTagger",
+    raw_texts: List[str],
+    previous_sentences: List[List[dict]],
+    aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
+    sentence_cache=None,
+    mini_batch_size: int = 32,
+) -> List[Tuple[dict, List[dict]]]:
+    """Returns the named entities of several texts and of each of their sentences,
+    only tagging the sentences that are not in their previous versions
+
+    The new sentences of all the texts are tagged together while aliases are
+    numbered independently for each text, as get_entities_batch does.
+
+    Args:
+        tagger (SequenceTagger): Flair SequenceTagger to perform NER
+        raw_texts (List[str]): new versions of the texts
+        previous_sentences (List[List[dict]]): for each text, sentences of its
+            previous version as returned by this function, empty if unknown
+        aliases_to_anonymize (list, optional): List of aliases to keep.
+            Defaults to ["LOC", "PER", "ORG"].
+        sentence_cache (ResultCache, optional): cache of the entities of
+            sentences, see tag_sentences. Defaults to None.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to 32.
+
+    Returns:
+        List[Tuple[dict, List[dict]]]: for each text, dictionary with unique
+            entities as keys and unique alias as values, and the {"key",
+            "entities"} fingerprint and entities (as pairs) of each sentence
+    """
+    keys_per_text = []
+    known_entities = {}
+    new_sentences = {}
+
+    for raw_text, sentences in zip(raw_texts, previous_sentences):
+        known_entities.update((s["key"], dict(s["entities"])) for s in sentences)
+        keys = []
+        for sentence in segment_text(raw_text):
+            key = get_sentence_key(sentence)
+            keys.append(key)
+            new_sentences.setdefault(key, sentence)
+        keys_per_text.append(keys)
+
+    for key in known_entities:
+        new_sentences.pop(key, None)
+
+    tagged_sentences = tag_sentences(
+        tagger=tagger,
+        sentences=list(new_sentences.values()),
+        sentence_cache=sentence_cache,
+        mini_batch_size=mini_batch_size,
+    )
+    known_entities.update(zip(new_sentences, tagged_sentences))
+
+    results = []
+    for keys in keys_per_text:
+        sentence_entities = [known_entities[key] for key in keys]
+        entities = merge_sentence_entities(sentence_entities, aliases_to_anonymize)
+        results.append(
+            (
+                entities,
+                [
+                    {"key": key, "entities": list(e.items())}
+                    for key, e in zip(keys, sentence_entities)
+                ],
+            )
+        )
+    return results
+
+
+def get_entities_incremental(
+    tagger: "SequenceTagger",
+    raw_text: str,
+    previous_sentences: List[dict],
+    aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
+    sentence_cache=None,
+    mini_batch_size: int = 32,
+) -> Tuple[dict, List[dict]]:
+    """Returns the named entities of an edited text, only tagging the sentences
+    that are not in its previous version
+
+    Aliases are numbered over the whole text, as get_entities does.
+
+    Args:
+        tagger (SequenceTagger): Flair SequenceTagger to perform NER
+        raw_text (str): new version of the text
+        previous_sentences (List[dict]): sentences of the previous version, as
+            returned by this function
+        aliases_to_anonymize (list, optional): List of aliases to keep.
+            Defaults to ["LOC", "PER", "ORG"].
+        sentence_cache (ResultCache, optional): cache of the entities of
+            sentences, see tag_sentences. Defaults to None.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to 32.
+
+    Returns:
+        Tuple[dict, List[dict]]: dictionary with unique entities as keys and
+            unique alias as values, and the {"key", "entities"} fingerprint and
+            entities (as pairs) of each sentence of the text
+    """
+    return get_entities_incremental_batch(
+        tagger=tagger,
+        raw_texts=[raw_text],
+        previous_sentences=[previous_sentences],
+        aliases_to_anonymize=aliases_to_anonymize,
+        sentence_cache=sentence_cache,
+        mini_batch_size=mini_batch_size,
+    )[0]
+
+
+def get_entities(
+    tagger: "SequenceTagger",
+    raw_text: str,
+    aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
+    sentence_cache=None,
+) -> dict:
+    """Returns a dictionary of named entities with a unique ID
+
+    Args:
+        tagger (SequenceTagger): Flair SequenceTagger to perform NER
+        raw_text (str): Sentence to alias
+        aliases_to_anonymize (list, optional): List of aliases to keep.
+            Defaults to ["LOC", "PER", "ORG"].
+        sentence_cache (ResultCache, optional): cache of the entities of
+            sentences, see tag_sentences. Defaults to None.
+
+    Returns:
+        dict: dictionary with unique entities as keys and unique alias as values
+    """
+    return get_entities_batch(
+        tagger=tagger,
+        raw_texts=[raw_text],
+        aliases_to_anonymize=aliases_to_anonymize,
+        sentence_cache=sentence_cache,
+    )[0]
+
+
 def replace_text(raw_text: str, entities: dict) -> str:
     """Returns a string with named entities replaced with alias ids
+
+    The text is scanned once: longer entities take precedence over the entities
+    they contain and entities are only matched on word boundaries.
+
     Args:
         raw_text (str): string to anonymize
         entities (dict): dictionary with named entities as keys and unique ids
@@ -49,16 +377,18 @@ def replace_text(raw_text: str, entities: dict) -> str:
     Returns:
         str: an anonymized string
     """
-    new_text = raw_text
+    texts = sorted((t for t in entities if t), key=len, reverse=True)
 
-    for text, alias in entities.items():
-        new_text = new_text.replace(text, alias)
+    if not texts:
+        return raw_text
 
-    return new_text
+    pattern = re.compile(r"(?<!\w)(?:%s)(?!\w)" % "|".join(map(re.escape, texts)))
+
+    return pattern.sub(lambda match: entities[match.group(0)], raw_text)
 
 
 def anonymize_text(
-    tagger: SequenceTagger,
+    tagger: "SequenceTagger",
     raw_text: str,
     aliases_to_anonymize: list = ["LOC", "PER", "ORG"],
 ) -> str:
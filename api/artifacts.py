@@ -0,0 +1,169 @@
+import copy
+import json
+import os
+import warnings
+
+MODULE_FILE = "model.pt"
+WEIGHTS_FILE = "weights.bin"
+INDEX_FILE = "weights.json"
+
+# offsets of the tensors in the weights file are aligned on this many bytes
+ALIGNMENT = 64
+
+
+def _named_tensors(model):
+    """Yields the (module, name, full name, tensor) of each parameter and buffer"""
+    for module_name, module in model.named_modules():
+        prefix = f"{module_name}." if module_name else ""
+        for tensors in (module._parameters, module._buffers):
+            for name, tensor in tensors.items():
+                if tensor is not None:
+                    yield module, name, prefix + name, tensor
+
+
+def named_word_vectors(model):
+    """Yields the (keyed vectors, full name, array) of the word vectors of each
+    flair WordEmbeddings of the model
+
+    These gensim vectors are numpy arrays, which are not among the parameters and
+    buffers of the model.
+    """
+    for module_name, module in model.named_modules():
+        keyed_vectors = getattr(module, "precomputed_word_embeddings", None)
+        array = getattr(keyed_vectors, "vectors", None)
+        if array is not None:
+            prefix = f"{module_name}." if module_name else ""
+            yield keyed_vectors, f"{prefix}precomputed_word_embeddings.vectors", array
+
+
+def _write_array(file, array, offset: int) -> int:
+    """Writes the array at the first aligned offset from offset, returns the
+    offset it is written at"""
+    offset += -offset % ALIGNMENT
+    file.seek(offset)
+    file.write(array.tobytes())
+    return offset
+
+
+def save_model_artifact(model, directory: str):
+    """Saves a torch model so that load_model_artifact can memory-map its weights
+
+    The weights, and the word vectors of the embeddings, are written one after the
+    other in a raw binary file described by a JSON index, and the model is pickled
+    with empty tensors and arrays in their place.
+
+    Args:
+        model (torch.nn.Module): model to save, it is not modified
+        directory (str): directory of the artifact, created if needed
+    """
+    import numpy as np
+    import torch
+
+    os.makedirs(directory, exist_ok=True)
+    skeleton = copy.deepcopy(model)
+    index = {}
+    offset = 0
+
+    with open(os.path.join(directory, WEIGHTS_FILE), "wb") as file:
+        for module, name, full_name, tensor in list(_named_tensors(skeleton)):
+            array = tensor.detach().cpu().contiguous().numpy()
+            offset = _write_array(file, array, offset)
+            index[full_name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+                "parameter": name in module._parameters,
+            }
+            offset += array.nbytes
+
+            empty = torch.empty(0, dtype=tensor.dtype)
+            if name in module._parameters:
+                module._parameters[name] = torch.nn.Parameter(
+                    empty, requires_grad=False
+                )
+            else:
+                module._buffers[name] = empty
+
+        for keyed_vectors, full_name, array in list(named_word_vectors(skeleton)):
+            array = np.ascontiguousarray(array)
+            offset = _write_array(file, array, offset)
+            index[full_name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+                "parameter": False,
+            }
+            offset += array.nbytes
+            keyed_vectors.vectors = np.empty((0,) + array.shape[1:], array.dtype)
+
+    with open(os.path.join(directory, INDEX_FILE), "w") as file:
+        json.dump(index, file)
+
+    torch.save(skeleton, os.path.join(directory, MODULE_FILE))
+
+
+def check_model_artifact(directory: str):
+    """Raises FileNotFoundError if the artifact directory is incomplete"""
+    for filename in (MODULE_FILE, WEIGHTS_FILE, INDEX_FILE):
+        path = os.path.join(directory, filename)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(
+                f"Model artifact '{path}' is missing, "
+                "build it with api_docker/starter.py."
+            )
+
+
+def load_model_artifact(directory: str):
+    """Loads a model saved by save_model_artifact
+
+    The weights and word vectors are memory-mapped read-only instead of being
+    copied: they are read from disk when first used and their pages are shared by
+    every process loading the same artifact.
+
+    Args:
+        directory (str): directory of the artifact
+
+    Returns:
+        torch.nn.Module: the model, in eval mode
+    """
+    import numpy as np
+    import torch
+
+    check_model_artifact(directory)
+
+    model = torch.load(os.path.join(directory, MODULE_FILE), map_location="cpu")
+    with open(os.path.join(directory, INDEX_FILE), "r") as file:
+        index = json.load(file)
+    weights_path = os.path.join(directory, WEIGHTS_FILE)
+    if os.path.getsize(weights_path) > 0:
+        weights = np.memmap(weights_path, dtype=np.uint8, mode="r")
+    else:
+        weights = np.empty(0, dtype=np.uint8)
+
+    def get_array(full_name: str):
+        entry = index[full_name]
+        dtype = np.dtype(entry["dtype"])
+        start = entry["offset"]
+        end = start + dtype.itemsize * int(np.prod(entry["shape"]))
+        return weights[start:end].view(dtype).reshape(entry["shape"])
+
+    with warnings.catch_warnings():
+        # the tensors share the read-only memory of the file
+        warnings.filterwarnings("ignore", message="The given NumPy array")
+
+        for module, name, full_name, _ in list(_named_tensors(model)):
+            entry = index[full_name]
+            tensor = torch.from_numpy(get_array(full_name))
+            if entry["parameter"]:
+                tensor = torch.nn.Parameter(tensor, requires_grad=False)
+            # setattr lets modules such as LSTMs refresh their references to
+            # their weights
+            setattr(module, name, tensor)
+
+    for keyed_vectors, full_name, _ in list(named_word_vectors(model)):
+        # artifacts saved before the word vectors were mapped still hold them
+        if full_name in index:
+            keyed_vectors.vectors = get_array(full_name)
+
+    model.eval()
+    return model
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+from typing import List
+
+from .scheduler import current_lane
+from .scheduler import LaneQueue
+
+
+class _PendingPrediction:
+    def __init__(self, sentences: list, mini_batch_size: int = None):
+        self.sentences = sentences
+        self.mini_batch_size = mini_batch_size
+        self.done = threading.Event()
+        self.error = None
+
+
+class BatchingTagger:
+    """Wraps a flair SequenceTagger so that concurrent calls to `predict` are
+    gathered into a single forward pass.
+
+    Callers block until their own sentences are tagged. Since flair annotates the
+    sentences in place, results are split back to each caller for free.
+
+    Queued calls join the batches in the order of the InferenceScheduler: calls of
+    the interactive lane (see scheduler.use_lane) before the bulk ones, and the
+    calls with the fewest tokens first.
+    """
+
+    def __init__(
+        self,
+        tagger,
+        max_batch_size: int = 64,
+        max_wait: float = 0.01,
+        mini_batch_size: int = 32,
+        starvation_deadline: float = 5,
+    ):
+        """
+        Args:
+            tagger (SequenceTagger): Flair SequenceTagger to perform NER
+            max_batch_size (int, optional): maximum number of sentences sent to
+                the tagger in one call. Defaults to 64.
+            max_wait (float, optional): maximum time (in seconds) to wait for
+                other requests once a first one is queued. Defaults to 0.01.
+            mini_batch_size (int, optional): mini batch size used by the tagger.
+                Defaults to 32.
+            starvation_deadline (float, optional): time (in seconds) after which
+                a queued call joins the next batch first. Defaults to 5.
+        """
+        self.tagger = tagger
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.mini_batch_size = mini_batch_size
+
+        self._queue = LaneQueue(starvation_deadline)
+        self._carry_over = None
+        self._worker = threading.Thread(
+            target=self._run, name="ner-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def __getattr__(self, name):
+        return getattr(self.tagger, name)
+
+    def predict(self, sentences, mini_batch_size: int = None, **kwargs):
+        """Tags the sentences in place, sharing the forward pass with concurrent
+        callers
+
+        Args:
+            sentences (Sentence or List[Sentence]): sentences to tag
+            mini_batch_size (int, optional): requested mini batch size, the
+                largest one of a batch is used. Defaults to the mini batch size
+                of the BatchingTagger.
+        """
+        if not isinstance(sentences, list):
+            sentences = [sentences]
+        if not sentences:
+            return
+
+        request = _PendingPrediction(sentences, mini_batch_size)
+        # the cost of flair sentences is their number of tokens
+        self._queue.put(
+            request, current_lane.get(), sum(len(sentence) for sentence in sentences)
+        )
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+
+    def close(self):
+        """Stops the worker thread once the queued predictions are done, so that
+        the tagger can be garbage collected"""
+        self._queue.close()
+
+    def _collect(self) -> List[_PendingPrediction]:
+        if self._carry_over is not None:
+            first, self._carry_over = self._carry_over, None
+        else:
+            first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        size = len(first.sentences)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                break
+            if size + len(request.sentences) > self.max_batch_size:
+                self._carry_over = request
+                break
+            batch.append(request)
+            size += len(request.sentences)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            sentences = [s for request in batch for s in request.sentences]
+            mini_batch_size = max(
+                request.mini_batch_size or self.mini_batch_size for request in batch
+            )
+            try:
+                self.tagger.predict(sentences, mini_batch_size=mini_batch_size)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
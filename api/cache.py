@@ -0,0 +1,181 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+from typing import Optional
+
+from prometheus_client import Counter
+from pymongo.collection import Collection
+
+CACHE_HITS = Counter(
+    "model_cache_hits_total",
+    "Model results served from the cache",
+    ["cache", "tier"],
+)
+CACHE_MISSES = Counter(
+    "model_cache_misses_total", "Model results missing from the cache", ["cache"]
+)
+
+
+def make_cache_key(raw_text: str, aliases_to_anonymize: list, model_name: str) -> str:
+    """Returns a stable digest identifying a model result
+
+    Args:
+        raw_text (str): text sent to the model
+        aliases_to_anonymize (list): list of aliases to anonymize
+        model_name (str): identifier of the model
+
+    Returns:
+        str: hexadecimal sha256 digest
+    """
+    payload = json.dumps([model_name, sorted(aliases_to_anonymize), raw_text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_size(key: str, value: dict) -> int:
+    return len(key) + len(json.dumps(value).encode("utf-8"))
+
+
+class MongoCacheTier:
+    """Second cache tier shared between workers and persisted across restarts"""
+
+    def __init__(self, collection: Collection, ttl: float):
+        self.collection = collection
+        self.ttl = ttl
+        self._index_created = False
+
+    def get(self, key: str) -> Optional[dict]:
+        expiration_date = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=self.ttl
+        )
+        document = self.collection.find_one(
+            {"_id": key, "created_at": {"$gt": expiration_date}}
+        )
+        if not document:
+            return None
+        # entities are stored as pairs since their text may contain dots
+        return dict(document["entities"])
+
+    def set(self, key: str, value: dict):
+        if not self._index_created:
+            self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl))
+            self._index_created = True
+        self.collection.update_one(
+            filter={"_id": key},
+            update={
+                "$set": {
+                    "entities": list(value.items()),
+                    "created_at": datetime.datetime.utcnow(),
+                }
+            },
+            upsert=True,
+        )
+
+
+class ResultCache:
+    """Thread-safe in-memory LRU cache with a time to live and a size limit"""
+
+    def __init__(
+        self,
+        name: str = "entities",
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600,
+        second_tier: MongoCacheTier = None,
+    ):
+        """
+        Args:
+            name (str, optional): name of the cache in the metrics.
+                Defaults to "entities".
+            max_entries (int, optional): maximum number of entries in memory.
+                Defaults to 1024.
+            max_bytes (int, optional): maximum size of the entries in memory.
+                Defaults to 64MB.
+            ttl (float, optional): time to live of an entry in seconds.
+                Defaults to 3600.
+            second_tier (MongoCacheTier, optional): tier queried on memory
+                misses. Defaults to None.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.second_tier = second_tier
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_from_memory(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires, size = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_in_memory(self, key: str, value: dict):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self._get_from_memory(key)
+        if value is not None:
+            CACHE_HITS.labels(cache=self.name, tier="memory").inc()
+            return dict(value)
+
+        if self.second_tier is not None:
+            value = self.second_tier.get(key)
+            if value is not None:
+                CACHE_HITS.labels(cache=self.name, tier="mongo").inc()
+                self._set_in_memory(key, value)
+                return dict(value)
+
+        CACHE_MISSES.labels(cache=self.name).inc()
+        return None
+
+    def set(self, key: str, value: dict):
+        self._set_in_memory(key, dict(value))
+        if self.second_tier is not None:
+            self.second_tier.set(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], dict]) -> dict:
+        """Returns the cached value for key or computes and stores it
+
+        Args:
+            key (str): cache key, see make_cache_key
+            compute (Callable[[], dict]): function computing the value
+
+        Returns:
+            dict: cached or computed value
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
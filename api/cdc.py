@@ -0,0 +1,137 @@
+"""Change-data-capture worker anonymizing articles as soon as they are inserted or
+their raw_text is modified.
+
+MongoDB change streams require a replica set (a single node one is enough, see
+mongo_docker/mongo_setup.sh). Run the worker with:
+
+    python -m api.cdc
+"""
+import datetime
+import logging
+import time
+
+from pymongo.change_stream import ChangeStream
+
+from .config import ARTICLE_DB
+from .config import CATEGORIES
+from .config import CDC_AUTHOR
+from .config import CDC_BATCH_SIZE
+from .config import CDC_CHECKPOINT_COLLECTION
+from .config import CDC_CHECKPOINT_INTERVAL
+from .config import CDC_MAX_WAIT_MS
+from .database import admin_db
+from .database import article_db
+from .indexes import check_query_plan
+from .jobs import anonymize_articles
+
+logger = logging.getLogger(__name__)
+
+checkpoint_collection = admin_db[CDC_CHECKPOINT_COLLECTION]
+
+# the worker's own writes do not modify raw_text and are therefore ignored, as
+# well as the edits for which the API already refreshed the anonymization
+PIPELINE = [
+    {
+        "$match": {
+            "ns.coll": {"$in": CATEGORIES},
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace"]}},
+                {
+                    "operationType": "update",
+                    "updateDescription.updatedFields.raw_text": {"$exists": True},
+                    "updateDescription.updatedFields.auto_anonymized_text": {
+                        "$exists": False
+                    },
+                },
+            ],
+        }
+    }
+]
+
+
+def load_resume_token() -> dict:
+    check_query_plan(checkpoint_collection, {"_id": ARTICLE_DB})
+    checkpoint = checkpoint_collection.find_one({"_id": ARTICLE_DB})
+    return checkpoint["resume_token"] if checkpoint else None
+
+
+def save_resume_token(resume_token: dict):
+    checkpoint_collection.update_one(
+        filter={"_id": ARTICLE_DB},
+        update={
+            "$set": {
+                "resume_token": resume_token,
+                "updated": datetime.datetime.utcnow(),
+            }
+        },
+        upsert=True,
+    )
+
+
+def collect_changes(stream: ChangeStream) -> list:
+    """Returns the next changes, at most CDC_BATCH_SIZE of them, waiting at most
+    about CDC_MAX_WAIT_MS"""
+    changes = []
+    deadline = time.monotonic() + CDC_MAX_WAIT_MS / 1000
+
+    while len(changes) < CDC_BATCH_SIZE and time.monotonic() < deadline:
+        change = stream.try_next()
+        if change is not None:
+            changes.append(change)
+
+    return changes
+
+
+def process_changes(changes: list):
+    """Anonymizes the articles of a batch of changes, one batch per category"""
+    articles = {}
+
+    for change in changes:
+        # the full document is missing when the article was deleted since
+        document = change.get("fullDocument")
+        if document and document.get("raw_text"):
+            category = change["ns"]["coll"]
+            articles.setdefault(category, {})[document["_id"]] = document
+
+    for category, documents in articles.items():
+        count = anonymize_articles(
+            category=category,
+            articles=list(documents.values()),
+            author=CDC_AUTHOR,
+            mode="cdc",
+        )
+        logger.info(f"Anonymized {count} articles in '{category}'")
+
+
+def run():
+    """Tails the article collections and anonymizes the changed articles
+
+    The resume token is saved after each batch so that a restarted worker
+    neither misses nor reprocesses events. It is also saved, at most every
+    CDC_CHECKPOINT_INTERVAL seconds, while no change arrives: the server keeps
+    advancing it, and an idle worker would otherwise restart from a token that
+    may have fallen off the oplog.
+    """
+    with article_db.watch(
+        pipeline=PIPELINE,
+        full_document="updateLookup",
+        resume_after=load_resume_token(),
+        max_await_time_ms=CDC_MAX_WAIT_MS,
+    ) as stream:
+        logger.info(f"Watching changes on '{ARTICLE_DB}'")
+        saved_token, saved_at = None, 0
+        while stream.alive:
+            changes = collect_changes(stream)
+            if changes:
+                process_changes(changes)
+            elif time.monotonic() - saved_at < CDC_CHECKPOINT_INTERVAL:
+                continue
+            if stream.resume_token is not None and stream.resume_token != saved_token:
+                save_resume_token(stream.resume_token)
+                saved_token = stream.resume_token
+            saved_at = time.monotonic()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -11,6 +11,9 @@ ANONYMIZED_ALIASES = list(ANONYMIZED_ALIASES_DESCRIPTION.keys())
 ENVIRONMENT = os.environ.get("ENVIRONMENT", "dev")
 # ENVIRONMENT should be one of dev, prod or docker-compose
 
+API_MODE = os.environ.get("API_MODE", "all")
+# API_MODE should be one of all, data (users and data routes) or model
+
 MONGO_URL = "mongodb://localhost:27017"
 
 if ENVIRONMENT == "docker-compose":
@@ -26,3 +29,139 @@ JWT_SECRET = "my_secret"  # TODO: change
 JWT_ALGORITHM = "HS256"
 
 CATEGORIES = ["news", "business", "health", "entertainment", "sport", "politics"]
+
+# number of articles per page of GET /data/articles, and its maximum
+ARTICLES_PAGE_SIZE = int(os.environ.get("ARTICLES_PAGE_SIZE", 50))
+ARTICLES_MAX_PAGE_SIZE = int(os.environ.get("ARTICLES_MAX_PAGE_SIZE", 500))
+# threads querying the categories concurrently, shared by all the requests
+ARTICLES_FANOUT_THREADS = int(os.environ.get("ARTICLES_FANOUT_THREADS", 12))
+
+# "log" or "fail" when a query of a route scans a whole collection, "off" to
+# not explain the queries, see api/indexes.py
+QUERY_PLAN_CHECK = os.environ.get(
+    "QUERY_PLAN_CHECK", "log" if ENVIRONMENT == "dev" else "off"
+)
+
+# inference
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 64))
+# maximum time (in milliseconds) a request waits for others to join its batch
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 10))
+INFERENCE_MINI_BATCH_SIZE = int(os.environ.get("INFERENCE_MINI_BATCH_SIZE", 32))
+
+# model of the batch anonymizations (jobs, CDC and /auto)
+MODEL_NAME = os.environ.get("MODEL_NAME", "ner")
+# model of the interactive /model/* routes, a faster one may be chosen
+MODEL_INTERACTIVE_NAME = os.environ.get("MODEL_INTERACTIVE_NAME", "ner")
+# models that requests may select with the model query parameter
+MODEL_ALLOWED_NAMES = os.environ.get("MODEL_ALLOWED_NAMES", "ner,ner-fast").split(",")
+# maximum total size (in bytes) of the loaded models, 0 for no limit. In the
+# "process" inference mode, it is split evenly between the worker processes
+MODEL_MEMORY_BUDGET = int(os.environ.get("MODEL_MEMORY_BUDGET", 2 * 1024**3))
+# directory of the model artifacts built by api_docker/starter.py, the models are
+# downloaded by flair when it is not set
+MODEL_ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR")
+
+# cache of the model results
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES", 1024))
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", 64 * 1024**2))
+# time to live of the cached results in seconds
+MODEL_CACHE_TTL = float(os.environ.get("MODEL_CACHE_TTL", 3600))
+# stores the cached results in MongoDB to share them between workers
+MODEL_CACHE_MONGO = os.environ.get("MODEL_CACHE_MONGO", "false").lower() == "true"
+MODEL_CACHE_COLLECTION = "model_cache"
+
+# "local" runs the model in the API process, "process" in a pool of workers and
+# "preload" loads it before gunicorn forks its workers, which share its memory
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "local")
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", 2))
+# torch intra-op threads of each worker process
+INFERENCE_TORCH_THREADS = int(os.environ.get("INFERENCE_TORCH_THREADS", 1))
+# predictions running at the same time in the "process" inference mode, the
+# others wait in the scheduler
+INFERENCE_SLOTS = int(os.environ.get("INFERENCE_SLOTS", INFERENCE_PROCESSES))
+# predictions waiting for longer (in milliseconds) are served first
+INFERENCE_STARVATION_MS = float(os.environ.get("INFERENCE_STARVATION_MS", 5000))
+# threads of the threadpool running the synchronous routes. A prediction holds one
+# until its result, so the default adds to the 40 threads of starlette as many as
+# predictions can run at the same time: a full batch, or every slot of the worker
+# pool in the "process" inference mode
+if INFERENCE_MODE == "process":
+    API_THREADS = int(os.environ.get("API_THREADS", 40 + INFERENCE_SLOTS))
+else:
+    API_THREADS = int(os.environ.get("API_THREADS", 40 + INFERENCE_MAX_BATCH_SIZE))
+
+# cache of the entities of single sentences, shared between documents
+SENTENCE_CACHE_MAX_ENTRIES = int(os.environ.get("SENTENCE_CACHE_MAX_ENTRIES", 65536))
+SENTENCE_CACHE_MAX_BYTES = int(
+    os.environ.get("SENTENCE_CACHE_MAX_BYTES", 32 * 1024**2)
+)
+
+# bulk auto-anonymization jobs
+AUTO_JOB_COLLECTION = "auto_anonymization_jobs"
+AUTO_JOB_CHUNK_SIZE = int(os.environ.get("AUTO_JOB_CHUNK_SIZE", 32))
+# running jobs not updated for this long (in seconds) are considered interrupted
+AUTO_JOB_STALE_AFTER = float(os.environ.get("AUTO_JOB_STALE_AFTER", 600))
+
+# change-data-capture worker, see api/cdc.py
+CDC_CHECKPOINT_COLLECTION = "cdc_checkpoints"
+CDC_BATCH_SIZE = int(os.environ.get("CDC_BATCH_SIZE", 32))
+# maximum time (in milliseconds) spent gathering a batch of changes
+CDC_MAX_WAIT_MS = int(os.environ.get("CDC_MAX_WAIT_MS", 1000))
+CDC_AUTHOR = "cdc_worker"
+# maximum time (in seconds) between two saves of the resume token while idle
+CDC_CHECKPOINT_INTERVAL = float(os.environ.get("CDC_CHECKPOINT_INTERVAL", 10))
+
+# author of the anonymization events of the offline anonymization, see api/offline.py
+OFFLINE_AUTHOR = "offline"
+
+# int8 dynamic quantization of the model, only enabled if the quantized model
+# agrees enough with the float model on the calibration texts
+INFERENCE_QUANTIZE = os.environ.get("INFERENCE_QUANTIZE", "false").lower() == "true"
+QUANTIZATION_MIN_AGREEMENT = float(os.environ.get("QUANTIZATION_MIN_AGREEMENT", 0.95))
+QUANTIZATION_CALIBRATION_FILE = os.environ.get(
+    "QUANTIZATION_CALIBRATION_FILE", "data/records.json"
+)
+if INFERENCE_QUANTIZE and INFERENCE_MODE == "preload":
+    # the calibration would run predictions in the gunicorn master, whose torch
+    # threads the forked workers would not inherit
+    raise ValueError(
+        "INFERENCE_QUANTIZE is not supported with INFERENCE_MODE=preload, use the "
+        "local or process inference mode."
+    )
+if INFERENCE_QUANTIZE and MODEL_ARTIFACT_DIR:
+    # the quantized layers are new tensors, the weights mapped from the artifact
+    # would be copied into the anonymous memory of each process
+    raise ValueError(
+        "INFERENCE_QUANTIZE is not supported with MODEL_ARTIFACT_DIR, the quantized "
+        "weights cannot be mapped from the artifact."
+    )
+
+# texts are split into chunks of at most SEGMENT_MAX_TOKENS tokens, long
+# sentences being split into windows overlapping by SEGMENT_OVERLAP_TOKENS
+SEGMENT_MAX_TOKENS = int(os.environ.get("SEGMENT_MAX_TOKENS", 128))
+SEGMENT_OVERLAP_TOKENS = int(os.environ.get("SEGMENT_OVERLAP_TOKENS", 16))
+if not 0 <= SEGMENT_OVERLAP_TOKENS < SEGMENT_MAX_TOKENS:
+    raise ValueError(
+        f"SEGMENT_OVERLAP_TOKENS ({SEGMENT_OVERLAP_TOKENS}) must be at least 0 and "
+        f"smaller than SEGMENT_MAX_TOKENS ({SEGMENT_MAX_TOKENS})."
+    )
+
+# part of the fingerprint stamped on anonymized articles, to bump when a change of
+# the anonymization code changes its output so that articles become stale
+ANONYMIZATION_VERSION = 1
+# maximum size (in characters) of the texts sent to the /model routes
+MODEL_MAX_TEXT_LENGTH = int(os.environ.get("MODEL_MAX_TEXT_LENGTH", 100_000))
+# maximum number of texts of /model/aliases/batch and /model/anonymize/batch
+MODEL_BATCH_MAX_TEXTS = int(os.environ.get("MODEL_BATCH_MAX_TEXTS", 256))
+# maximum total size (in characters) of the texts of a batch, which are held in
+# memory and tagged together
+MODEL_BATCH_MAX_TEXT_LENGTH = int(
+    os.environ.get("MODEL_BATCH_MAX_TEXT_LENGTH", 1_000_000)
+)
+
+# streaming anonymization, see api/streaming.py
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", 16))
+# maximum number of records read ahead of the inference
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", 64))
+# a character may take up to 6 bytes once escaped in JSON
+STREAM_MAX_LINE_BYTES = 6 * MODEL_MAX_TEXT_LENGTH + 1024
@@ -0,0 +1,14 @@
+from pymongo import MongoClient
+
+from .config import ADMIN_DB
+from .config import ADMIN_ROLE_COLLECTION
+from .config import ADMIN_USER_COLLECTION
+from .config import ARTICLE_DB
+from .config import MONGO_URL
+
+client = MongoClient(MONGO_URL)
+article_db = client[ARTICLE_DB]
+admin_db = client[ADMIN_DB]
+
+role_collection = admin_db[ADMIN_ROLE_COLLECTION]
+user_collection = admin_db[ADMIN_USER_COLLECTION]
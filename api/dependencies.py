@@ -0,0 +1,44 @@
+from fastapi import Depends
+from fastapi import HTTPException
+
+from .authentication import check_permissions
+from .authentication import decodeJWT
+from .authentication import JWTBearer
+from .authentication import User
+from .config import MODEL_ALLOWED_NAMES
+from .database import role_collection
+from .database import user_collection
+from .indexes import check_query_plan
+
+
+async def get_current_user(token: str = Depends(JWTBearer())):
+    username = decodeJWT(token)["user_id"]
+    check_query_plan(user_collection, {"username": username})
+    user_data = user_collection.find_one(
+        filter={"username": username}, projection={"password": 0}
+    )
+
+    if user_data:
+        return User(**user_data)
+    raise HTTPException(401, detail="Invalid Token.")
+
+
+def check_user_permissions(username, route_name):
+    roles = check_permissions(
+        username=username,
+        route_name=route_name,
+        user_collection=user_collection,
+        role_collection=role_collection,
+    )
+    if not isinstance(roles, list):
+        raise HTTPException(403, detail="User is not allowed to perform this action.")
+    return roles
+
+
+def check_model_name(model_name: str):
+    if model_name not in MODEL_ALLOWED_NAMES:
+        raise HTTPException(
+            422,
+            detail=f"Model '{model_name}' is not allowed, "
+            f"choose one of {MODEL_ALLOWED_NAMES}.",
+        )
@@ -0,0 +1,143 @@
+"""Indexes of the MongoDB collections and guard against queries scanning whole
+collections
+
+The indexes are declared in INDEXES and created at startup by apply_indexes.
+Creating an index that already exists is a no-op, so that they are applied
+on every start.
+"""
+import logging
+import threading
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+from pymongo import ASCENDING
+from pymongo import DESCENDING
+from pymongo import IndexModel
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+from .config import ADMIN_DB
+from .config import ADMIN_ROLE_COLLECTION
+from .config import ADMIN_USER_COLLECTION
+from .config import ARTICLE_DB
+from .config import CATEGORIES
+from .config import QUERY_PLAN_CHECK
+from .pagination import SORT_FIELDS
+from .stamps import FINGERPRINT_FIELD
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_INDEXES = [
+    # GET /data/articles sorted on any sort field, the keyset cursor being on
+    # (field, _id), in either direction
+    *(IndexModel([(field, ASCENDING), ("_id", ASCENDING)]) for field in SORT_FIELDS),
+    # GET /data/articles filtered by section, from the most recently published
+    IndexModel(
+        [("section", ASCENDING), ("date_published", DESCENDING), ("_id", DESCENDING)]
+    ),
+    # stale filter of GET /data/articles and of the jobs
+    IndexModel([(FINGERPRINT_FIELD, ASCENDING)]),
+]
+
+# indexes by database and collection
+INDEXES = {
+    ARTICLE_DB: {category: ARTICLE_INDEXES for category in CATEGORIES},
+    ADMIN_DB: {
+        # get_current_user and check_permissions on every authenticated request
+        ADMIN_USER_COLLECTION: [IndexModel([("username", ASCENDING)], unique=True)],
+        ADMIN_ROLE_COLLECTION: [IndexModel([("role", ASCENDING)])],
+    },
+}
+
+# shapes of the queries already checked by check_query_plan
+_checked_queries = set()
+_checked_queries_lock = threading.Lock()
+
+
+def apply_indexes(client: MongoClient, indexes: Dict[str, dict] = INDEXES) -> List[str]:
+    """Creates the missing indexes
+
+    An index that cannot be created, for instance a unique index on duplicated
+    values, is logged and skipped.
+
+    Args:
+        client (MongoClient): client of the databases
+        indexes (Dict[str, dict], optional): indexes by database and collection.
+            Defaults to INDEXES.
+
+    Returns:
+        List[str]: full names of the indexes, "database.collection.index"
+    """
+    names = []
+    for database_name, collections in indexes.items():
+        for collection_name, models in collections.items():
+            collection = client[database_name][collection_name]
+            for model in models:
+                try:
+                    name = collection.create_indexes([model])[0]
+                except OperationFailure as e:
+                    logger.error(
+                        f"Cannot create index {model.document['key']} on "
+                        f"'{collection.full_name}': {e}"
+                    )
+                    continue
+                names.append(f"{collection.full_name}.{name}")
+    logger.info(f"Applied {len(names)} indexes.")
+    return names
+
+
+def get_plan_stages(plan: dict) -> Iterator[str]:
+    """Yields the stages of a query plan, as returned by explain"""
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from get_plan_stages(plan[key])
+    for key in ("inputStages", "shards"):
+        for child in plan.get(key, []):
+            yield from get_plan_stages(child)
+
+
+def _get_shape(value):
+    """Returns the shape of a filter: its operators and fields without values"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _get_shape(v)) for k, v in value.items()))
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return tuple(_get_shape(v) for v in value)
+    return None
+
+
+def check_query_plan(collection: Collection, mongo_filter: dict, sort: list = None):
+    """Logs, or raises an error, when a query scans the whole collection
+
+    Enabled by QUERY_PLAN_CHECK ("log" in dev), each shape of query (fields and
+    operators of the filter, and sort) is only explained once per process.
+
+    Raises:
+        RuntimeError: if QUERY_PLAN_CHECK is "fail" and the winning plan of the
+            query is a collection scan
+    """
+    if QUERY_PLAN_CHECK not in ("log", "fail"):
+        return
+
+    shape = (collection.full_name, _get_shape(mongo_filter), repr(sort))
+    with _checked_queries_lock:
+        if shape in _checked_queries:
+            return
+
+    explanation = collection.find(filter=mongo_filter, sort=sort).explain()
+    stages = set(get_plan_stages(explanation["queryPlanner"]["winningPlan"]))
+    if "COLLSCAN" in stages:
+        message = (
+            f"Query {mongo_filter} sorted on {sort} scans the whole collection "
+            f"'{collection.full_name}', see api/indexes.py"
+        )
+        if QUERY_PLAN_CHECK == "fail":
+            # checked again next time, until an index is added
+            raise RuntimeError(message)
+        logger.warning(message)
+
+    with _checked_queries_lock:
+        _checked_queries.add(shape)
@@ -0,0 +1,450 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+from .aliasing_model import get_entities
+from .aliasing_model import get_entities_batch
+from .aliasing_model import get_entities_incremental_batch
+from .batching import BatchingTagger
+from .cache import make_cache_key
+from .cache import MongoCacheTier
+from .cache import ResultCache
+from .config import ANONYMIZED_ALIASES
+from .config import INFERENCE_MAX_BATCH_SIZE
+from .config import INFERENCE_MAX_WAIT_MS
+from .config import INFERENCE_MINI_BATCH_SIZE
+from .config import INFERENCE_MODE
+from .config import INFERENCE_PROCESSES
+from .config import INFERENCE_SLOTS
+from .config import INFERENCE_STARVATION_MS
+from .config import INFERENCE_TORCH_THREADS
+from .config import MODEL_ALLOWED_NAMES
+from .config import MODEL_CACHE_COLLECTION
+from .config import MODEL_CACHE_MAX_BYTES
+from .config import MODEL_CACHE_MAX_ENTRIES
+from .config import MODEL_CACHE_MONGO
+from .config import MODEL_CACHE_TTL
+from .config import MODEL_INTERACTIVE_NAME
+from .config import MODEL_MEMORY_BUDGET
+from .config import MODEL_NAME
+from .database import admin_db
+from .loading import freeze_tagger
+from .loading import load_tagger
+from .registry import get_model_size
+from .registry import ModelRegistry
+from .scheduler import estimate_cost
+from .scheduler import InferenceScheduler
+from .scheduler import use_lane
+from .singleflight import SingleFlight
+from .stamps import get_model_fingerprint
+from .stamps import is_model_state_known
+from .stamps import record_model_state
+from .workers import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# the models are loaded on first use (or by warm_up) so that importing the API
+# does not import flair nor torch
+worker_pool = None
+
+_worker_pool_lock = threading.Lock()
+_model_ready = threading.Event()
+
+# taggers and model info loaded by preload_models, before the workers are forked
+_preloaded_models = {}
+
+entity_cache = ResultCache(
+    max_entries=MODEL_CACHE_MAX_ENTRIES,
+    max_bytes=MODEL_CACHE_MAX_BYTES,
+    ttl=MODEL_CACHE_TTL,
+    second_tier=MongoCacheTier(admin_db[MODEL_CACHE_COLLECTION], ttl=MODEL_CACHE_TTL)
+    if MODEL_CACHE_MONGO
+    else None,
+)
+
+entity_flights = SingleFlight("entities")
+
+# short interactive predictions go before long and bulk ones, in the queue of
+# the worker pool of the "process" inference mode
+scheduler = InferenceScheduler(
+    slots=INFERENCE_SLOTS, starvation_deadline=INFERENCE_STARVATION_MS / 1000
+)
+
+
+@contextmanager
+def schedule(lane: str, raw_texts: List[str]) -> Iterator[None]:
+    """Orders the prediction of the texts made in the context with the others
+
+    In the "process" inference mode, the prediction waits for one of the
+    INFERENCE_SLOTS slots of the scheduler. Otherwise, it joins the queue of the
+    BatchingTagger of the model, which orders it the same way, so that concurrent
+    predictions still share a forward pass.
+    """
+    if INFERENCE_MODE == "process":
+        with scheduler.slot(lane, estimate_cost(raw_texts)):
+            yield
+    else:
+        with use_lane(lane):
+            yield
+
+
+def _load_batching_tagger(model_name: str) -> Tuple[BatchingTagger, dict]:
+    # the batching thread is started here since threads do not survive a fork
+    loaded_tagger, info = _preloaded_models.pop(model_name, None) or load_tagger(
+        model_name
+    )
+    tagger = BatchingTagger(
+        loaded_tagger,
+        max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+        max_wait=INFERENCE_MAX_WAIT_MS / 1000,
+        mini_batch_size=INFERENCE_MINI_BATCH_SIZE,
+        starvation_deadline=INFERENCE_STARVATION_MS / 1000,
+    )
+    record_model_state(model_name, info)
+    return tagger, info
+
+
+# models of the "local" and "preload" inference modes
+registry = ModelRegistry(
+    loader=_load_batching_tagger, memory_budget=MODEL_MEMORY_BUDGET
+)
+
+
+def get_worker_pool() -> WorkerPool:
+    """Returns the worker pool of the "process" inference mode, started on first
+    use"""
+    global worker_pool
+
+    with _worker_pool_lock:
+        if worker_pool is None:
+            # workers load the interactive model when they start
+            worker_pool = WorkerPool(
+                model_name=MODEL_INTERACTIVE_NAME,
+                processes=INFERENCE_PROCESSES,
+                num_threads=INFERENCE_TORCH_THREADS,
+                memory_budget=MODEL_MEMORY_BUDGET,
+            )
+    return worker_pool
+
+
+def load_model(model_name: str = MODEL_INTERACTIVE_NAME):
+    """Loads a model if it is not loaded yet, safe to call from several threads"""
+    if INFERENCE_MODE == "process":
+        # waits for every worker to load the model
+        record_model_state(model_name, get_worker_pool().load_model(model_name))
+    else:
+        registry.load(model_name)
+
+    if model_name == MODEL_INTERACTIVE_NAME:
+        _model_ready.set()
+
+
+def load_model_state(model_name: str = MODEL_NAME):
+    """Loads the model if whether it is quantized is not known yet, so that its
+    fingerprint is that of the model actually used"""
+    if not is_model_state_known(model_name):
+        load_model(model_name)
+
+
+def preload_models(
+    model_names: List[str] = MODEL_ALLOWED_NAMES,
+    memory_budget: int = MODEL_MEMORY_BUDGET,
+) -> List[str]:
+    """Loads and freezes taggers in the current process so that the processes
+    forked afterwards share their memory (gunicorn --preload)
+
+    The interactive model is loaded first, then the other models in order while
+    they fit in the memory budget, the others being loaded on first use by each
+    process.
+
+    No prediction runs here: torch would start threads that the forked
+    processes would not inherit. This is why the configuration refuses
+    INFERENCE_QUANTIZE in this mode, its calibration running predictions.
+
+    Args:
+        model_names (List[str], optional): names of the models.
+            Defaults to MODEL_ALLOWED_NAMES.
+        memory_budget (int, optional): maximum total size (in bytes) of the
+            preloaded models, 0 for no limit. Defaults to MODEL_MEMORY_BUDGET.
+
+    Returns:
+        List[str]: names of the preloaded models
+    """
+    total_size = 0
+    # sorting is stable, the other models keep their order
+    for model_name in sorted(model_names, key=lambda n: n != MODEL_INTERACTIVE_NAME):
+        if model_name in _preloaded_models:
+            continue
+        tagger, info = load_tagger(model_name)
+        size = get_model_size(tagger)
+        if memory_budget and total_size and total_size + size > memory_budget:
+            logger.info(
+                f"Model '{model_name}' is not preloaded, it does not fit in the "
+                "memory budget."
+            )
+            continue
+        # frozen after the budget check, a frozen tagger is never collected
+        freeze_tagger(tagger)
+        _preloaded_models[model_name] = (tagger, info)
+        total_size += size
+    return list(_preloaded_models)
+
+
+def warm_up():
+    """Loads the interactive model in the background"""
+    threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+
+
+def is_model_ready() -> bool:
+    return _model_ready.is_set()
+
+
+def list_models() -> List[dict]:
+    """Returns the description of the loaded models"""
+    if INFERENCE_MODE == "process":
+        return worker_pool.get_models() if worker_pool is not None else []
+    return registry.describe()
+
+
+def shutdown():
+    if worker_pool is not None:
+        worker_pool.shutdown()
+
+
+def predict_entities(
+    raw_text: str, aliases_to_anonymize: list, model_name: str, lane: str
+):
+    with schedule(lane, [raw_text]):
+        return _predict_entities(raw_text, aliases_to_anonymize, model_name)
+
+
+def _predict_entities(raw_text: str, aliases_to_anonymize: list, model_name: str):
+    if INFERENCE_MODE == "process":
+        # the forward pass runs in a worker process, this thread only waits
+        return get_worker_pool().get_entities(
+            raw_text, aliases_to_anonymize, model_name
+        )
+    with registry.use(model_name) as model:
+        return get_entities(
+            tagger=model.tagger,
+            raw_text=raw_text,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+        )
+
+
+def compute_entities(
+    raw_text: str,
+    aliases_to_anonymize: list = ANONYMIZED_ALIASES,
+    model_name: str = MODEL_NAME,
+    lane: str = "interactive",
+):
+    """Returns the named entities of raw_text, using the cache when possible
+
+    Args:
+        raw_text (str): text to alias
+        aliases_to_anonymize (list, optional): aliases to keep.
+            Defaults to ANONYMIZED_ALIASES.
+        model_name (str, optional): name of the model. Defaults to MODEL_NAME.
+        lane (str, optional): lane of the prediction, see schedule,
+            "interactive" or "bulk". Defaults to "interactive".
+
+    Returns:
+        dict: dictionary with unique entities as keys and unique alias as values
+    """
+    load_model_state(model_name)
+    key = make_cache_key(
+        raw_text=raw_text,
+        aliases_to_anonymize=aliases_to_anonymize,
+        # cached results become stale when the model or its configuration change
+        model_name=get_model_fingerprint(model_name),
+    )
+    # concurrent requests for the same text share a single prediction
+    return entity_cache.get_or_compute(
+        key,
+        lambda: entity_flights.do(
+            key,
+            lambda: predict_entities(raw_text, aliases_to_anonymize, model_name, lane),
+        ),
+    )
+
+
+def predict_entities_batch(
+    raw_texts: List[str],
+    aliases_to_anonymize: list,
+    mini_batch_size: int,
+    model_name: str,
+    lane: str,
+):
+    with schedule(lane, raw_texts):
+        return _predict_entities_batch(
+            raw_texts, aliases_to_anonymize, mini_batch_size, model_name
+        )
+
+
+def _predict_entities_batch(
+    raw_texts: List[str],
+    aliases_to_anonymize: list,
+    mini_batch_size: int,
+    model_name: str,
+):
+    if INFERENCE_MODE == "process":
+        return get_worker_pool().get_entities_batch(
+            raw_texts, aliases_to_anonymize, mini_batch_size, model_name
+        )
+    with registry.use(model_name) as model:
+        return get_entities_batch(
+            tagger=model.tagger,
+            raw_texts=raw_texts,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+            mini_batch_size=mini_batch_size,
+        )
+
+
+def compute_entities_batch(
+    raw_texts: List[str],
+    aliases_to_anonymize: list = ANONYMIZED_ALIASES,
+    mini_batch_size: int = INFERENCE_MINI_BATCH_SIZE,
+    model_name: str = MODEL_NAME,
+    lane: str = "interactive",
+) -> List[dict]:
+    """Returns the named entities of each text, the texts missing from the cache
+    being tagged together in a single call to the tagger
+
+    Args:
+        raw_texts (List[str]): texts to alias
+        aliases_to_anonymize (list, optional): aliases to keep.
+            Defaults to ANONYMIZED_ALIASES.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to INFERENCE_MINI_BATCH_SIZE.
+        model_name (str, optional): name of the model. Defaults to MODEL_NAME.
+        lane (str, optional): lane of the prediction, see schedule,
+            "interactive" or "bulk". Defaults to "interactive".
+
+    Returns:
+        List[dict]: for each text, dictionary with unique entities as keys and
+            unique alias as values
+    """
+    load_model_state(model_name)
+    keys = [
+        make_cache_key(
+            raw_text=raw_text,
+            aliases_to_anonymize=aliases_to_anonymize,
+            model_name=get_model_fingerprint(model_name),
+        )
+        for raw_text in raw_texts
+    ]
+    results = [entity_cache.get(key) for key in keys]
+    missing = [index for index, entities in enumerate(results) if entities is None]
+
+    if missing:
+        predictions = predict_entities_batch(
+            [raw_texts[index] for index in missing],
+            aliases_to_anonymize,
+            mini_batch_size=mini_batch_size,
+            model_name=model_name,
+            lane=lane,
+        )
+        for index, entities in zip(missing, predictions):
+            entity_cache.set(keys[index], entities)
+            results[index] = entities
+
+    return results
+
+
+def compute_entities_incremental(
+    raw_text: str,
+    previous_sentences: List[dict],
+    aliases_to_anonymize: list = ANONYMIZED_ALIASES,
+    model_name: str = MODEL_NAME,
+    lane: str = "interactive",
+) -> Tuple[dict, List[dict]]:
+    """Returns the named entities of an edited text and of each of its sentences,
+    only the sentences missing from previous_sentences being tagged"""
+    return compute_entities_incremental_batch(
+        [raw_text],
+        [previous_sentences],
+        aliases_to_anonymize=aliases_to_anonymize,
+        model_name=model_name,
+        lane=lane,
+    )[0]
+
+
+def compute_entities_incremental_batch(
+    raw_texts: List[str],
+    previous_sentences: List[List[dict]],
+    aliases_to_anonymize: list = ANONYMIZED_ALIASES,
+    mini_batch_size: int = INFERENCE_MINI_BATCH_SIZE,
+    model_name: str = MODEL_NAME,
+    lane: str = "interactive",
+) -> List[Tuple[dict, List[dict]]]:
+    """Returns the named entities of edited texts and of each of their sentences,
+    the sentences missing from previous_sentences being tagged together
+
+    Args:
+        raw_texts (List[str]): texts to alias
+        previous_sentences (List[List[dict]]): for each text, sentences of its
+            previous version, see aliasing_model.get_entities_incremental_batch
+        aliases_to_anonymize (list, optional): aliases to keep.
+            Defaults to ANONYMIZED_ALIASES.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to INFERENCE_MINI_BATCH_SIZE.
+        model_name (str, optional): name of the model. Defaults to MODEL_NAME.
+        lane (str, optional): lane of the prediction, see schedule,
+            "interactive" or "bulk". Defaults to "interactive".
+
+    Returns:
+        List[Tuple[dict, List[dict]]]: for each text, dictionary with unique
+            entities as keys and unique alias as values, and its sentences
+    """
+    # the cost of the unchanged sentences is overestimated, they are not tagged
+    with schedule(lane, raw_texts):
+        results = _predict_entities_incremental_batch(
+            raw_texts,
+            previous_sentences,
+            aliases_to_anonymize,
+            mini_batch_size,
+            model_name,
+        )
+
+    load_model_state(model_name)
+    for raw_text, (entities, _) in zip(raw_texts, results):
+        key = make_cache_key(
+            raw_text=raw_text,
+            aliases_to_anonymize=aliases_to_anonymize,
+            # cached results become stale when the model or its configuration change
+            model_name=get_model_fingerprint(model_name),
+        )
+        entity_cache.set(key, entities)
+
+    return results
+
+
+def _predict_entities_incremental_batch(
+    raw_texts: List[str],
+    previous_sentences: List[List[dict]],
+    aliases_to_anonymize: list,
+    mini_batch_size: int,
+    model_name: str,
+) -> List[Tuple[dict, List[dict]]]:
+    if INFERENCE_MODE == "process":
+        return get_worker_pool().get_entities_incremental_batch(
+            raw_texts,
+            previous_sentences,
+            aliases_to_anonymize,
+            mini_batch_size,
+            model_name,
+        )
+    with registry.use(model_name) as model:
+        return get_entities_incremental_batch(
+            tagger=model.tagger,
+            raw_texts=raw_texts,
+            previous_sentences=previous_sentences,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+            mini_batch_size=mini_batch_size,
+        )
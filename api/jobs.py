@@ -0,0 +1,282 @@
+import datetime
+import threading
+from typing import List
+
+import bson
+from pymongo import ReturnDocument
+from pymongo import UpdateOne
+
+from .config import AUTO_JOB_CHUNK_SIZE
+from .config import AUTO_JOB_COLLECTION
+from .config import AUTO_JOB_STALE_AFTER
+from .config import CATEGORIES
+from .config import MODEL_NAME
+from .database import admin_db
+from .database import article_db
+from .indexes import check_query_plan
+from .inference import compute_entities_incremental_batch
+from .inference import load_model_state
+from .stamps import FINGERPRINT_FIELD
+from .stamps import get_model_fingerprint
+from .stamps import is_up_to_date
+from .stamps import TEXT_HASH_FIELD
+from .utils import build_article_filter
+from .utils import build_auto_anonymization
+from .utils import build_auto_anonymization_event
+
+job_collection = admin_db[AUTO_JOB_COLLECTION]
+
+
+def format_job(job: dict) -> dict:
+    job["job_id"] = str(job["_id"])
+    return job
+
+
+def _get_filter(filters: dict) -> dict:
+    if filters.get("stale_only"):
+        load_model_state(MODEL_NAME)
+    return build_article_filter(
+        sections=filters.get("sections"),
+        date_start=filters.get("date_start"),
+        date_end=filters.get("date_end"),
+        stale_only=filters.get("stale_only", False),
+    )
+
+
+def create_job(filters: dict, author: str) -> dict:
+    """Stores a new pending job anonymizing the articles matching the filters
+
+    Args:
+        filters (dict): category, sections, date_start and date_end filters
+        author (str): username of the user creating the job
+
+    Returns:
+        dict: the job document
+    """
+    mongo_filter = _get_filter(filters)
+    categories = filters.get("category") or CATEGORIES
+    if mongo_filter:
+        # counting every article of a collection scans it whatever the indexes
+        for category in categories:
+            check_query_plan(article_db[category], mongo_filter)
+
+    date = datetime.datetime.utcnow()
+    job = {
+        "filters": filters,
+        "status": "pending",
+        "author": author,
+        "total": sum(article_db[c].count_documents(mongo_filter) for c in categories),
+        "processed": 0,
+        # last processed _id of each category
+        "progress": {},
+        "cancel_requested": False,
+        "created": date,
+        "updated": date,
+    }
+    job["_id"] = job_collection.insert_one(job).inserted_id
+    return job
+
+
+def start_job(job_id: bson.ObjectId):
+    threading.Thread(
+        target=run_job, args=(job_id,), name=f"auto-job-{job_id}", daemon=True
+    ).start()
+
+
+def anonymize_articles(
+    category: str,
+    articles: List[dict],
+    author: str,
+    mode: str = "batch",
+    job_id=None,
+):
+    """Anonymizes the articles with a single batched inference and writes them back
+    with a single bulk_write
+
+    Articles already anonymized from their current raw_text by the current model
+    and configuration are skipped, and the unchanged sentences of the others are
+    not tagged again.
+
+    Args:
+        category (str): collection of the articles
+        articles (List[dict]): articles with their _id, raw_text, stamp and
+            auto_anonymized_sentences
+        author (str): author of the anonymization events
+        mode (str, optional): mode of the anonymization events.
+            Defaults to "batch".
+        job_id (ObjectId, optional): job anonymizing the articles.
+            Defaults to None.
+
+    Returns:
+        int: number of anonymized articles
+    """
+    load_model_state(MODEL_NAME)
+    articles = [a for a in articles if not is_up_to_date(a, MODEL_NAME)]
+    if not articles:
+        return 0
+
+    fingerprint = get_model_fingerprint(MODEL_NAME)
+    # the sentences of an edited article are only tagged again if they changed
+    previous_sentences = [
+        article.get("auto_anonymized_sentences", [])
+        if article.get(FINGERPRINT_FIELD) == fingerprint
+        else []
+        for article in articles
+    ]
+    # jobs and the CDC worker must not delay the interactive requests
+    results = compute_entities_incremental_batch(
+        [a["raw_text"] for a in articles], previous_sentences, lane="bulk"
+    )
+    date = datetime.datetime.utcnow()
+
+    operations = []
+    for article, (aliases, sentences) in zip(articles, results):
+        event = build_auto_anonymization_event(
+            date=date, author=author, model_name=MODEL_NAME, mode=mode, job_id=job_id
+        )
+        operations.append(
+            UpdateOne(
+                filter={"_id": article["_id"]},
+                update={
+                    "$set": build_auto_anonymization(
+                        article["raw_text"], aliases, sentences, MODEL_NAME
+                    ),
+                    "$push": {"events": event},
+                },
+            )
+        )
+
+    article_db[category].bulk_write(operations, ordered=False)
+
+    return len(operations)
+
+
+def run_job(job_id: bson.ObjectId):
+    """Anonymizes the articles of a job chunk by chunk, starting after the last
+    processed article of each category"""
+    job = job_collection.find_one_and_update(
+        filter={"_id": job_id},
+        update={"$set": {"status": "running", "updated": datetime.datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    mongo_filter = _get_filter(job["filters"])
+
+    try:
+        for category in job["filters"].get("category") or CATEGORIES:
+            last_id = job["progress"].get(category)
+
+            while not job["cancel_requested"]:
+                chunk_filter = dict(mongo_filter)
+                if last_id is not None:
+                    chunk_filter["_id"] = {"$gt": last_id}
+                check_query_plan(article_db[category], chunk_filter, [("_id", 1)])
+
+                articles = list(
+                    article_db[category].find(
+                        filter=chunk_filter,
+                        projection={
+                            "raw_text": 1,
+                            "auto_anonymized_sentences": 1,
+                            FINGERPRINT_FIELD: 1,
+                            TEXT_HASH_FIELD: 1,
+                        },
+                        sort=[("_id", 1)],
+                        limit=AUTO_JOB_CHUNK_SIZE,
+                    )
+                )
+                if not articles:
+                    break
+
+                anonymize_articles(
+                    category=category,
+                    articles=articles,
+                    author=job["author"],
+                    job_id=job_id,
+                )
+
+                last_id = articles[-1]["_id"]
+                job = job_collection.find_one_and_update(
+                    filter={"_id": job_id},
+                    update={
+                        "$set": {
+                            f"progress.{category}": last_id,
+                            "updated": datetime.datetime.utcnow(),
+                        },
+                        "$inc": {"processed": len(articles)},
+                    },
+                    return_document=ReturnDocument.AFTER,
+                )
+
+            if job["cancel_requested"]:
+                status = "cancelled"
+                break
+        else:
+            status = "completed"
+    except Exception as e:
+        job_collection.update_one(
+            filter={"_id": job_id},
+            update={
+                "$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "updated": datetime.datetime.utcnow(),
+                }
+            },
+        )
+        return
+
+    job_collection.update_one(
+        filter={"_id": job_id},
+        update={"$set": {"status": status, "updated": datetime.datetime.utcnow()}},
+    )
+
+
+def cancel_job(job_id: bson.ObjectId) -> dict:
+    """Requests the cancellation of a job, the job stops after its current chunk
+
+    Returns:
+        dict: the job document or None if it does not exist
+    """
+    job_collection.update_one(
+        filter={"_id": job_id, "status": "pending"},
+        update={"$set": {"status": "cancelled"}},
+    )
+    return job_collection.find_one_and_update(
+        filter={"_id": job_id},
+        update={
+            "$set": {"cancel_requested": True, "updated": datetime.datetime.utcnow()}
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def resume_job(job_id: bson.ObjectId) -> dict:
+    """Restarts a failed, cancelled or interrupted job where it stopped
+
+    Returns:
+        dict: the job document or None if the job cannot be resumed
+    """
+    stale_date = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=AUTO_JOB_STALE_AFTER
+    )
+    job = job_collection.find_one_and_update(
+        filter={
+            "_id": job_id,
+            "$or": [
+                {"status": {"$in": ["failed", "cancelled"]}},
+                {"status": "running", "updated": {"$lt": stale_date}},
+            ],
+        },
+        update={
+            "$set": {
+                "status": "pending",
+                "cancel_requested": False,
+                "error": None,
+                "updated": datetime.datetime.utcnow(),
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        start_job(job_id)
+    return job
@@ -0,0 +1,83 @@
+import os
+from typing import Tuple
+
+from .artifacts import check_model_artifact
+from .artifacts import load_model_artifact
+from .config import INFERENCE_QUANTIZE
+from .config import MODEL_ARTIFACT_DIR
+from .config import QUANTIZATION_CALIBRATION_FILE
+from .config import QUANTIZATION_MIN_AGREEMENT
+from .quantization import load_calibration_texts
+from .quantization import quantize_if_accurate
+
+
+def get_artifact_directory(model_name: str) -> str:
+    """Returns the artifact directory of a model, None when MODEL_ARTIFACT_DIR is
+    not set
+
+    Raises:
+        FileNotFoundError: if the artifact of the model is missing
+    """
+    if not MODEL_ARTIFACT_DIR:
+        return None
+    directory = os.path.join(MODEL_ARTIFACT_DIR, model_name)
+    check_model_artifact(directory)
+    return directory
+
+
+def load_tagger(model_name: str) -> Tuple[object, dict]:
+    """Loads a Flair SequenceTagger for inference
+
+    The tagger is memory-mapped from its artifact when MODEL_ARTIFACT_DIR is set,
+    and loaded through flair (which may download it) otherwise.
+
+    Args:
+        model_name (str): name of the flair model
+
+    Returns:
+        Tuple[SequenceTagger, dict]: the tagger and a description of the model
+    """
+    directory = get_artifact_directory(model_name)
+
+    if directory is not None:
+        tagger = load_model_artifact(directory)
+    else:
+        from flair.models import SequenceTagger
+
+        tagger = SequenceTagger.load(model_name)
+        tagger.eval()
+
+    model_info = {"model": model_name, "quantized": False}
+
+    if INFERENCE_QUANTIZE:
+        quantized_tagger, agreement = quantize_if_accurate(
+            tagger,
+            texts=load_calibration_texts(QUANTIZATION_CALIBRATION_FILE),
+            min_agreement=QUANTIZATION_MIN_AGREEMENT,
+        )
+        model_info["quantized"] = quantized_tagger is not tagger
+        model_info["agreement"] = agreement
+        tagger = quantized_tagger
+
+    return tagger, model_info
+
+
+def freeze_tagger(tagger):
+    """Prepares a loaded tagger to be shared by forked processes
+
+    Disables gradients so that inference never writes to the weights, then moves
+    every object allocated so far out of the reach of the garbage collector:
+    collections would otherwise touch their headers and copy the memory pages
+    holding the model in each process.
+
+    Args:
+        tagger (SequenceTagger): Flair SequenceTagger to freeze
+    """
+    import gc
+
+    tagger.eval()
+    for parameter in tagger.parameters():
+        parameter.requires_grad_(False)
+
+    gc.collect()
+    gc.freeze()
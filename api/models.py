@@ -1,11 +1,43 @@
 import datetime
 from typing import List
+from typing import Optional
 
 from pydantic import BaseModel
+from pydantic import constr
+from pydantic import create_model
+from pydantic import Field
+from pydantic import validator
+
+from .config import MODEL_BATCH_MAX_TEXT_LENGTH
+from .config import MODEL_BATCH_MAX_TEXTS
+from .config import MODEL_MAX_TEXT_LENGTH
 
 
 class Text(BaseModel):
-    text: str = "The UN is said to meet in New-York according to Donald Trump."
+    text: str = Field(
+        "The UN is said to meet in New-York according to Donald Trump.",
+        max_length=MODEL_MAX_TEXT_LENGTH,
+    )
+
+
+class TextBatch(BaseModel):
+    texts: List[constr(max_length=MODEL_MAX_TEXT_LENGTH)] = Field(
+        [
+            "The UN is said to meet in New-York according to Donald Trump.",
+            "Joe Biden met Emmanuel Macron in Paris.",
+        ],
+        max_items=MODEL_BATCH_MAX_TEXTS,
+    )
+
+    @validator("texts")
+    def check_total_length(cls, texts):
+        length = sum(len(text) for text in texts)
+        if length > MODEL_BATCH_MAX_TEXT_LENGTH:
+            raise ValueError(
+                f"the texts total {length} characters, more than the "
+                f"{MODEL_BATCH_MAX_TEXT_LENGTH} allowed in a batch"
+            )
+        return texts
 
 
 class Alias(BaseModel):
@@ -56,6 +88,8 @@ class Event(BaseModel):
     author: str = "paul_dechorgnat"
     date: datetime.datetime = datetime.datetime(2021, 12, 1, 14, 32, 33)
     mode: str = None
+    model: str = None
+    fingerprint: str = None
 
 
 class Article(NewArticle):
@@ -67,3 +101,37 @@ class Article(NewArticle):
     events: List[Event]
     auto_anonymized_aliases: List[Alias] = []
     manual_anonymized_aliases: List[Alias] = []
+
+
+# article restricted to the fields requested with the fields parameter: every
+# field is optional, so that only the fields present are validated, and is
+# meant to be serialized with exclude_unset
+PartialArticle = create_model(
+    "PartialArticle",
+    **{
+        name: (Optional[field.outer_type_], None)
+        for name, field in Article.__fields__.items()
+    },
+)
+
+
+class AutoAnonymizationJobFilters(BaseModel):
+    category: List[str] = None
+    sections: List[str] = None
+    date_start: datetime.datetime = None
+    date_end: datetime.datetime = None
+    # only the articles not anonymized by the current model and configuration
+    stale_only: bool = False
+
+
+class AutoAnonymizationJob(BaseModel):
+    job_id: str = "633c6473b9daeb8a90169dcb"
+    status: str = "running"
+    author: str = "paul_dechorgnat"
+    filters: AutoAnonymizationJobFilters = AutoAnonymizationJobFilters()
+    total: int = 0
+    processed: int = 0
+    cancel_requested: bool = False
+    created: datetime.datetime = datetime.datetime(2021, 12, 1, 14, 32, 33)
+    updated: datetime.datetime = datetime.datetime(2021, 12, 1, 14, 32, 33)
+    error: str = None
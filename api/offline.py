@@ -0,0 +1,333 @@
+"""Anonymizes a corpus of articles from file to file, without the API nor MongoDB
+
+The input is either a JSON array of articles, such as data/records.json, or a
+JSONL file with one article per line. It is read as a stream, so that large
+corpora are never loaded whole. The anonymized articles are written as JSONL in
+the order of the input, with the fields of an automatic anonymization by the
+API:
+
+    python -m api.offline data/records.json anonymized.jsonl --processes 4
+
+An interrupted run is resumed with --resume, which skips the records already in
+the output, or from a given record with --start.
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import IO
+from typing import Iterator
+from typing import List
+
+from .aliasing_model import get_sentence_key
+from .aliasing_model import merge_sentence_entities
+from .aliasing_model import segment_text
+from .aliasing_model import tag_sentences
+from .config import ANONYMIZED_ALIASES
+from .config import AUTO_JOB_CHUNK_SIZE
+from .config import INFERENCE_MINI_BATCH_SIZE
+from .config import INFERENCE_PROCESSES
+from .config import INFERENCE_TORCH_THREADS
+from .config import MODEL_NAME
+from .config import OFFLINE_AUTHOR
+from .loading import load_tagger
+from .registry import LoadedModel
+from .stamps import record_model_state
+from .utils import build_auto_anonymization
+from .utils import build_auto_anonymization_event
+
+logger = logging.getLogger(__name__)
+
+# size (in characters) of the reads of the input file
+READ_SIZE = 1024**2
+
+# model of the current worker process, set by _init_worker
+_model = None
+
+
+def _read_array(file: IO[str], buffer: str) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    position = 1  # after the opening bracket
+    eof = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # the record is incomplete, or the file is invalid
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield record
+        position = end
+
+
+def read_records(file: IO[str]) -> Iterator[dict]:
+    """Yields the records of a JSON array or of a JSONL file, reading the file
+    progressively
+
+    Args:
+        file (IO[str]): file opened in text mode
+
+    Yields:
+        dict: records of the file, in order
+    """
+    buffer = file.read(READ_SIZE).lstrip()
+    if buffer.startswith("["):
+        yield from _read_array(file, buffer)
+        return
+
+    lines = buffer.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        # the last line continues in the rest of the file
+        lines[-1] += file.readline()
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def count_lines(path: str) -> int:
+    """Returns the number of complete lines of a file, and removes its last line
+    if it is incomplete, so that appending to the file resumes a run"""
+    count = 0
+    complete = 0
+    with open(path, "rb+") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            complete += len(line)
+        file.truncate(complete)
+    return count
+
+
+def _init_worker(model_name: str, num_threads: int):
+    global _model
+
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _model = LoadedModel(model_name, *load_tagger(model_name))
+    record_model_state(model_name, _model.info)
+
+
+def anonymize_records(
+    records: List[dict], model_name: str, mini_batch_size: int
+) -> List[dict]:
+    """Adds the automatic anonymization fields to the records having a raw_text,
+    their sentences being tagged together. Runs in a worker process.
+
+    Args:
+        records (List[dict]): records to anonymize
+        model_name (str): name of the model of the worker
+        mini_batch_size (int): number of sentences per forward pass of the
+            tagger
+
+    Returns:
+        List[dict]: the records, with the fields set by the API
+    """
+    texts = [record["raw_text"] for record in records if record.get("raw_text")]
+    sentences_per_text = [segment_text(raw_text) for raw_text in texts]
+    tagged_sentences = iter(
+        tag_sentences(
+            tagger=_model.tagger,
+            sentences=[s for sentences in sentences_per_text for s in sentences],
+            sentence_cache=_model.sentence_cache,
+            mini_batch_size=mini_batch_size,
+        )
+    )
+
+    # written as JSON, like the dates of the input
+    date = datetime.datetime.utcnow().isoformat()
+    results = []
+    sentences_iterator = iter(sentences_per_text)
+    for record in records:
+        if not record.get("raw_text"):
+            results.append(record)
+            continue
+
+        raw_text = record["raw_text"]
+        sentences = next(sentences_iterator)
+        sentence_entities = list(islice(tagged_sentences, len(sentences)))
+        aliases = merge_sentence_entities(sentence_entities, ANONYMIZED_ALIASES)
+        stored_sentences = [
+            {"key": get_sentence_key(sentence), "entities": list(e.items())}
+            for sentence, e in zip(sentences, sentence_entities)
+        ]
+        event = build_auto_anonymization_event(
+            date=date, author=OFFLINE_AUTHOR, model_name=model_name, mode="offline"
+        )
+        results.append(
+            {
+                **record,
+                **build_auto_anonymization(
+                    raw_text, aliases, stored_sentences, model_name
+                ),
+                "events": record.get("events", []) + [event],
+            }
+        )
+    return results
+
+
+def _chunks(records: Iterator[dict], chunk_size: int) -> Iterator[List[dict]]:
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def anonymize_file(
+    input_path: str,
+    output_path: str,
+    model_name: str = MODEL_NAME,
+    processes: int = INFERENCE_PROCESSES,
+    num_threads: int = INFERENCE_TORCH_THREADS,
+    chunk_size: int = AUTO_JOB_CHUNK_SIZE,
+    mini_batch_size: int = INFERENCE_MINI_BATCH_SIZE,
+    start: int = 0,
+) -> dict:
+    """Anonymizes the records of a JSON or JSONL file into a JSONL file
+
+    Chunks of records are anonymized by worker processes each holding a tagger,
+    and at most two chunks per worker are in flight so that the memory stays
+    bounded whatever the size of the input.
+
+    Args:
+        input_path (str): JSON array or JSONL file of articles
+        output_path (str): JSONL file of the anonymized articles
+        model_name (str, optional): name of the model. Defaults to MODEL_NAME.
+        processes (int, optional): number of worker processes.
+            Defaults to INFERENCE_PROCESSES.
+        num_threads (int, optional): number of torch intra-op threads per
+            worker. Defaults to INFERENCE_TORCH_THREADS.
+        chunk_size (int, optional): number of records per task.
+            Defaults to AUTO_JOB_CHUNK_SIZE.
+        mini_batch_size (int, optional): number of sentences per forward pass
+            of the tagger. Defaults to INFERENCE_MINI_BATCH_SIZE.
+        start (int, optional): offset of the first record to anonymize, the
+            output is appended to when it is not 0. Defaults to 0.
+
+    Returns:
+        dict: number of records and words anonymized, duration and throughput
+    """
+    started = time.monotonic()
+    statistics = {"records": 0, "words": 0}
+
+    with open(input_path, "r", encoding="utf-8") as input_file, open(
+        output_path, "a" if start else "w", encoding="utf-8"
+    ) as output_file, ProcessPoolExecutor(
+        max_workers=processes,
+        # forking a process in which torch already started threads may deadlock
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, num_threads),
+    ) as executor:
+        records = islice(read_records(input_file), start, None)
+        pending = deque()
+
+        def write_next():
+            for record in pending.popleft().result():
+                output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                statistics["records"] += 1
+                statistics["words"] += len((record.get("raw_text") or "").split())
+            logger.info(f"Anonymized {start + statistics['records']} records.")
+
+        for chunk in _chunks(records, chunk_size):
+            pending.append(
+                executor.submit(anonymize_records, chunk, model_name, mini_batch_size)
+            )
+            if len(pending) >= 2 * processes:
+                write_next()
+        while pending:
+            write_next()
+
+    statistics["seconds"] = time.monotonic() - started
+    statistics["records_per_second"] = statistics["records"] / statistics["seconds"]
+    statistics["words_per_second"] = statistics["words"] / statistics["seconds"]
+    return statistics
+
+
+def parse_arguments(arguments: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m api.offline",
+        description="Anonymizes a JSON array or JSONL file of articles into a "
+        "JSONL file.",
+    )
+    parser.add_argument("input", help="JSON array or JSONL file of articles")
+    parser.add_argument("output", help="JSONL file of the anonymized articles")
+    parser.add_argument("--model", default=MODEL_NAME, help="name of the model")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=INFERENCE_PROCESSES,
+        help="number of worker processes",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=INFERENCE_TORCH_THREADS,
+        help="number of torch threads per worker process",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=AUTO_JOB_CHUNK_SIZE,
+        help="number of records per task",
+    )
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="offset of the first record to anonymize, appended to the output",
+    )
+    resume.add_argument(
+        "--resume",
+        action="store_true",
+        help="skips the records already in the output",
+    )
+    return parser.parse_args(arguments)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_arguments()
+
+    start = arguments.start
+    if arguments.resume and os.path.exists(arguments.output):
+        start = count_lines(arguments.output)
+        logger.info(f"Resuming after {start} records.")
+
+    statistics = anonymize_file(
+        input_path=arguments.input,
+        output_path=arguments.output,
+        model_name=arguments.model,
+        processes=arguments.processes,
+        num_threads=arguments.threads,
+        chunk_size=arguments.chunk_size,
+        start=start,
+    )
+    print(
+        f"{statistics['records']} records ({statistics['words']} words) in "
+        f"{statistics['seconds']:.1f} s: "
+        f"{statistics['records_per_second']:.1f} records/s, "
+        f"{statistics['words_per_second']:.0f} words/s"
+    )
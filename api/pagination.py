@@ -0,0 +1,168 @@
+import base64
+import datetime
+import re
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+from bson import Decimal128
+from bson import json_util
+from bson import MaxKey
+from bson import MinKey
+from bson import ObjectId
+from bson import Regex
+from bson import Timestamp
+
+# fields the articles can be sorted on, ties being broken by _id
+SORT_FIELDS = ["date_published", "headline", "author", "section"]
+# most recently published first
+DEFAULT_SORT = "-date_published"
+
+# aliases of the BSON types ($type) in the order MongoDB sorts them, a missing
+# field sorting as null
+BSON_TYPE_ORDER = [
+    ["minKey"],
+    ["null"],
+    ["double", "int", "long", "decimal"],
+    ["symbol", "string"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+    ["maxKey"],
+]
+
+# BSON type of the values decoded by pymongo, bool before int which it subclasses
+_PYTHON_TYPES = [
+    (type(None), "null"),
+    (bool, "bool"),
+    ((int, float, Decimal128), "double"),
+    (str, "string"),
+    (dict, "object"),
+    ((list, tuple), "array"),
+    (bytes, "binData"),
+    (ObjectId, "objectId"),
+    (datetime.datetime, "date"),
+    (Timestamp, "timestamp"),
+    ((Regex, re.Pattern), "regex"),
+    (MinKey, "minKey"),
+    (MaxKey, "maxKey"),
+]
+
+
+def parse_sort(sort: str) -> List[Tuple[str, int]]:
+    """Returns the MongoDB sort of the sort parameter, a field of SORT_FIELDS
+    prefixed with "-" for the descending order
+
+    Raises:
+        ValueError: if the field is not one of SORT_FIELDS
+    """
+    field = sort.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Cannot sort on '{field}', expected one of {SORT_FIELDS}.")
+    direction = -1 if sort.startswith("-") else 1
+    return [(field, direction), ("_id", direction)]
+
+
+def get_type_rank(value) -> int:
+    """Returns the rank of the BSON type of the value in BSON_TYPE_ORDER, values
+    of other types ranking as objects"""
+    for python_types, bson_type in _PYTHON_TYPES:
+        if isinstance(value, python_types):
+            break
+    else:
+        bson_type = "object"
+    return next(i for i, types in enumerate(BSON_TYPE_ORDER) if bson_type in types)
+
+
+def _get_sort_value(value) -> tuple:
+    """Returns a key ordering values of any BSON type as MongoDB does"""
+    rank = get_type_rank(value)
+    if value is None or isinstance(value, (MinKey, MaxKey)):
+        return rank, 0
+    if isinstance(value, Decimal128):
+        return rank, value.to_decimal()
+    if isinstance(value, Timestamp):
+        return rank, (value.time, value.inc)
+    if isinstance(value, (Regex, re.Pattern)):
+        return rank, value.pattern
+    if isinstance(value, (str, bool, int, float, bytes, ObjectId, datetime.datetime)):
+        return rank, value
+    # documents and arrays are rarely sorted on, they are ordered by their JSON
+    return rank, json_util.dumps(value)
+
+
+def get_sort_key(sort: List[Tuple[str, int]]) -> Callable[[dict], tuple]:
+    """Returns the key ordering the articles like the sort, in ascending order
+
+    Like MongoDB, values are ordered by BSON type first, a missing field sorting
+    as null, so that articles whose field has different types can be compared.
+    """
+    field = sort[0][0]
+    return lambda article: (_get_sort_value(article.get(field)), article["_id"])
+
+
+def encode_cursor(article: dict, sort: List[Tuple[str, int]]) -> str:
+    """Returns the opaque cursor of the page starting after the article"""
+    field, direction = sort[0]
+    position = {
+        "sort": [field, direction],
+        "value": article.get(field),
+        "_id": article["_id"],
+    }
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode("utf-8")).decode()
+
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> tuple:
+    """Returns the value of the sort field and the _id of the last article of the
+    previous page
+
+    Raises:
+        ValueError: if the cursor is not one returned by encode_cursor for the
+            same sort
+    """
+    try:
+        position = json_util.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+        if position["sort"] != list(sort[0]):
+            raise ValueError("The cursor was returned for another sort.")
+        return position["value"], position["_id"]
+    except (ValueError, TypeError, KeyError) as e:
+        # invalid base64 or JSON, or another sort
+        raise ValueError(f"Invalid cursor '{cursor}'.") from e
+
+
+def build_cursor_filter(cursor: str, sort: List[Tuple[str, int]]) -> dict:
+    """Returns the MongoDB filter selecting the articles after the cursor, which
+    an index on the sort answers without scanning the previous pages
+
+    Since comparisons only match values of the same BSON type, the articles whose
+    field has a type sorting after the one of the cursor are selected by type.
+
+    Raises:
+        ValueError: if the cursor is invalid
+    """
+    value, object_id = decode_cursor(cursor, sort)
+    field, direction = sort[0]
+    operator = "$lt" if direction < 0 else "$gt"
+    rank = get_type_rank(value)
+    if direction < 0:
+        following_ranks = range(rank)
+    else:
+        following_ranks = range(rank + 1, len(BSON_TYPE_ORDER))
+    following_types = [t for r in following_ranks for t in BSON_TYPE_ORDER[r]]
+
+    clauses = [
+        {field: {operator: value}},
+        {field: value, "_id": {operator: object_id}},
+    ]
+    if "null" in following_types:
+        # null also matches the missing fields, unlike {"$type": "null"}
+        following_types.remove("null")
+        clauses.append({field: None})
+    if following_types:
+        clauses.append({field: {"$type": following_types}})
+    return {"$or": clauses}
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+from typing import List
+from typing import Tuple
+
+from .aliasing_model import get_entities
+
+logger = logging.getLogger(__name__)
+
+
+def quantize_tagger(tagger):
+    """Returns a copy of the tagger with int8 dynamically quantized LSTM and linear
+    layers, which speeds up CPU inference
+
+    Args:
+        tagger (SequenceTagger): float32 Flair SequenceTagger
+
+    Returns:
+        SequenceTagger: quantized tagger
+    """
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        tagger, {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def entity_agreement(reference_tagger, tagger, texts: List[str]) -> float:
+    """Returns the agreement (F1 score) between the entities found by two taggers
+
+    Args:
+        reference_tagger (SequenceTagger): tagger taken as ground truth
+        tagger (SequenceTagger): tagger to evaluate
+        texts (List[str]): texts to tag
+
+    Returns:
+        float: agreement between 0 and 1
+    """
+    common, reference_count, count = 0, 0, 0
+
+    for text in texts:
+        # without aliases to anonymize, entities are mapped to their tag
+        reference = set(get_entities(reference_tagger, text, []).items())
+        entities = set(get_entities(tagger, text, []).items())
+
+        common += len(reference & entities)
+        reference_count += len(reference)
+        count += len(entities)
+
+    if reference_count + count == 0:
+        return 1.0
+    return 2 * common / (reference_count + count)
+
+
+def load_calibration_texts(path: str) -> List[str]:
+    """Returns the raw texts of a JSON file of records, like data/records.json"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as file:
+        return [record["raw_text"] for record in json.load(file)]
+
+
+def quantize_if_accurate(
+    tagger, texts: List[str], min_agreement: float
+) -> Tuple[object, float]:
+    """Returns the quantized tagger if it agrees enough with the float tagger
+
+    Args:
+        tagger (SequenceTagger): float32 Flair SequenceTagger
+        texts (List[str]): calibration texts
+        min_agreement (float): minimal agreement to use the quantized tagger
+
+    Returns:
+        Tuple[SequenceTagger, float]: the tagger to use and the measured
+            agreement (None if it could not be measured)
+    """
+    if not texts:
+        logger.warning("No calibration texts, the model is not quantized.")
+        return tagger, None
+
+    quantized_tagger = quantize_tagger(tagger)
+    agreement = entity_agreement(tagger, quantized_tagger, texts)
+
+    if agreement < min_agreement:
+        logger.warning(
+            f"Quantized model agreement {agreement:.3f} is below {min_agreement}, "
+            "the model is not quantized."
+        )
+        return tagger, agreement
+
+    return quantized_tagger, agreement
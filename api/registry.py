@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+from .artifacts import named_word_vectors
+from .cache import ResultCache
+from .config import MODEL_CACHE_TTL
+from .config import SENTENCE_CACHE_MAX_BYTES
+from .config import SENTENCE_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+def get_model_size(tagger) -> int:
+    """Returns the size in bytes of the parameters and buffers of a model, and of
+    the word vectors of its embeddings"""
+    tensors = list(tagger.parameters()) + list(tagger.buffers())
+    vectors = [array for _, _, array in named_word_vectors(tagger)]
+    return sum(t.numel() * t.element_size() for t in tensors) + sum(
+        array.nbytes for array in vectors
+    )
+
+
+class LoadedModel:
+    def __init__(self, name: str, tagger, info: dict):
+        self.name = name
+        self.tagger = tagger
+        self.info = info
+        self.size = get_model_size(tagger)
+        # the entities of a sentence depend on the model
+        self.sentence_cache = ResultCache(
+            name="sentences",
+            max_entries=SENTENCE_CACHE_MAX_ENTRIES,
+            max_bytes=SENTENCE_CACHE_MAX_BYTES,
+            ttl=MODEL_CACHE_TTL,
+        )
+        self.users = 0
+        self.last_used = time.time()
+
+    def close(self):
+        close = getattr(self.tagger, "close", None)
+        if close is not None:
+            close()
+
+
+class ModelRegistry:
+    """Loads taggers on demand by name and keeps them while they fit in a memory
+    budget, evicting the least recently used idle models first.
+
+    Models are used through `use`, which prevents their eviction while they
+    are predicting. Loads are serialized so that two models never load at the
+    same time.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Tuple[object, dict]],
+        memory_budget: int = 0,
+    ):
+        """
+        Args:
+            loader (Callable[[str], Tuple[SequenceTagger, dict]]): loads a
+                tagger and its description from its name, like load_tagger
+            memory_budget (int, optional): maximum total size (in bytes) of the
+                loaded models, 0 for no limit. A model larger than the budget is
+                still loaded once every idle model is evicted. Defaults to 0.
+        """
+        self.loader = loader
+        self.memory_budget = memory_budget
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _get(self, name: str) -> LoadedModel:
+        model = self._models.get(name)
+        if model is not None:
+            model.users += 1
+            self._models.move_to_end(name)
+        return model
+
+    def _acquire(self, name: str) -> LoadedModel:
+        with self._lock:
+            model = self._get(name)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            with self._lock:
+                model = self._get(name)
+            if model is not None:
+                return model
+
+            tagger, info = self.loader(name)
+            model = LoadedModel(name, tagger, info)
+            logger.info(f"Loaded model '{name}' ({model.size / 1024**2:.0f} MB).")
+
+            with self._lock:
+                model.users += 1
+                self._models[name] = model
+                self._evict()
+
+        return model
+
+    def _release(self, model: LoadedModel):
+        with self._lock:
+            model.users -= 1
+            model.last_used = time.time()
+            self._evict()
+
+    def _evict(self):
+        """Evicts idle models, least recently used first, until the loaded models
+        fit in the budget. Must be called with the lock held."""
+        if not self.memory_budget:
+            return
+
+        total_size = sum(model.size for model in self._models.values())
+        for name, model in list(self._models.items()):
+            if total_size <= self.memory_budget:
+                break
+            if model.users > 0:
+                continue
+            del self._models[name]
+            model.close()
+            total_size -= model.size
+            logger.info(f"Evicted model '{name}' to stay within the memory budget.")
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[LoadedModel]:
+        """Loads the model if needed and keeps it loaded while in the context
+
+        Args:
+            name (str): name of the model
+
+        Yields:
+            LoadedModel: the model, with its tagger and sentence cache
+        """
+        model = self._acquire(name)
+        try:
+            yield model
+        finally:
+            self._release(model)
+
+    def load(self, name: str):
+        """Loads the model if it is not loaded yet"""
+        with self.use(name):
+            pass
+
+    def describe(self) -> List[dict]:
+        """Returns the description of the loaded models, most recently used last"""
+        with self._lock:
+            return [
+                {
+                    **model.info,
+                    "model": model.name,
+                    "size": model.size,
+                    "in_use": model.users > 0,
+                    "last_used": model.last_used,
+                }
+                for model in self._models.values()
+            ]
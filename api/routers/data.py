@@ -0,0 +1,619 @@
+import datetime
+import heapq
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from itertools import islice
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import bson
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from ..authentication import User
+from ..config import ARTICLES_FANOUT_THREADS
+from ..config import ARTICLES_MAX_PAGE_SIZE
+from ..config import ARTICLES_PAGE_SIZE
+from ..config import CATEGORIES
+from ..config import MODEL_ALLOWED_NAMES
+from ..config import MODEL_NAME
+from ..database import article_db
+from ..dependencies import check_model_name
+from ..dependencies import check_user_permissions
+from ..dependencies import get_current_user
+from ..indexes import check_query_plan
+from ..inference import compute_entities_incremental
+from ..inference import load_model_state
+from ..models import Article
+from ..models import ManualAnonymizedData
+from ..models import NewArticle
+from ..models import PartialArticle
+from ..models import UpdateArticleData
+from ..pagination import build_cursor_filter
+from ..pagination import DEFAULT_SORT
+from ..pagination import encode_cursor
+from ..pagination import get_sort_key
+from ..pagination import parse_sort
+from ..pagination import SORT_FIELDS
+from ..singleflight import SingleFlight
+from ..stamps import FINGERPRINT_FIELD
+from ..stamps import get_model_fingerprint
+from ..stamps import is_up_to_date
+from ..utils import build_article_filter
+from ..utils import build_auto_anonymization
+from ..utils import build_auto_anonymization_event
+from ..utils import build_projection
+from ..utils import format_object_id
+from ..utils import mask_texts
+from ..utils import parse_fields
+
+router = APIRouter()
+
+auto_anonymization_flights = SingleFlight("auto_anonymization")
+
+# queries the categories concurrently, pymongo releasing the GIL while it waits
+fanout_executor = ThreadPoolExecutor(
+    max_workers=ARTICLES_FANOUT_THREADS, thread_name_prefix="articles-fanout"
+)
+
+FIELDS_QUERY = Query(
+    default=None,
+    description="Fields of the articles to return, for instance "
+    "headline,date_published,section. Defaults to all of them.",
+)
+
+
+def get_projection(fields: List[str], sort_field: str = "date_published") -> dict:
+    """Returns the MongoDB projection of the fields parameter, None for whole
+    documents
+
+    Raises:
+        HTTPException: 422 if a field is not a field of Article
+    """
+    if not fields:
+        return None
+    try:
+        return build_projection(parse_fields(fields), sort_field=sort_field)
+    except ValueError as e:
+        raise HTTPException(422, detail=str(e))
+
+
+def format_article(record: dict, roles: list, fields: List[str] = None):
+    """Returns the article of a MongoDB document, masked according to the roles
+
+    Args:
+        record (dict): MongoDB document of the article
+        roles (list): roles of the user
+        fields (List[str], optional): fields parameter of the request, the
+            article is then a dictionary of only these fields, the other ones
+            being neither validated nor returned. Defaults to None.
+
+    Returns:
+        Article or dict: the article
+    """
+    record = mask_texts(record=format_object_id(record), roles=roles)
+    if not fields:
+        return Article(**record)
+    fields = parse_fields(fields)
+    return PartialArticle(**{f: record[f] for f in fields if f in record}).dict(
+        exclude_unset=True
+    )
+
+
+def auto_anonymize_fields(
+    raw_text: str, model_name: str, previous_article: dict = None
+) -> dict:
+    """Returns the automatic anonymization fields of an article
+
+    The entities of each sentence are stored with their fingerprint so that only
+    the sentences added or changed by the next edit of raw_text are tagged.
+
+    Args:
+        raw_text (str): text of the article
+        model_name (str): name of the model
+        previous_article (dict, optional): previous version of the article, its
+            auto_anonymized_sentences are reused if they were tagged by the
+            same model and code, see stamps.get_model_fingerprint. Defaults to
+            None.
+
+    Returns:
+        dict: fields to set on the article
+    """
+    # the fingerprint depends on whether the loaded model is quantized
+    load_model_state(model_name)
+    fingerprint = get_model_fingerprint(model_name)
+    previous_sentences = []
+    if previous_article and previous_article.get(FINGERPRINT_FIELD) == fingerprint:
+        previous_sentences = previous_article.get("auto_anonymized_sentences", [])
+
+    aliases, sentences = compute_entities_incremental(
+        raw_text=raw_text,
+        previous_sentences=previous_sentences,
+        model_name=model_name,
+    )
+    return build_auto_anonymization(raw_text, aliases, sentences, model_name)
+
+
+def auto_anonymize_article(
+    category: str, object_id: bson.ObjectId, model_name: str, author: str
+) -> Article:
+    """Generates and stores the automatic anonymization of an article, unless it
+    is up to date
+
+    Raises:
+        HTTPException: 404 if the article does not exist
+    """
+    check_query_plan(article_db[category], {"_id": object_id})
+    old_article = article_db[category].find_one(filter={"_id": object_id})
+
+    if not old_article:
+        raise HTTPException(404, detail=f"Object with id '{object_id}' not found.")
+
+    load_model_state(model_name)
+    if is_up_to_date(old_article, model_name):
+        # same text, model and configuration: the anonymization would not change
+        return Article(**format_object_id(old_article))
+
+    new_data = auto_anonymize_fields(
+        raw_text=old_article["raw_text"],
+        model_name=model_name,
+        previous_article=old_article,
+    )
+    new_data["events"] = old_article["events"] + [
+        build_auto_anonymization_event(
+            date=datetime.datetime.utcnow(), author=author, model_name=model_name
+        )
+    ]
+
+    article_db[category].update_one(
+        filter={"_id": object_id}, update={"$set": new_data}
+    )
+
+    result = article_db[category].find_one(filter={"_id": object_id})
+
+    return Article(**format_object_id(result))
+
+
+def _open_cursor(
+    collection: str,
+    mongo_filter: dict,
+    sort: List[Tuple[str, int]],
+    limit: int,
+    projection: dict,
+) -> Iterator[dict]:
+    check_query_plan(article_db[collection], mongo_filter, sort)
+    cursor = article_db[collection].find(
+        filter=mongo_filter, projection=projection, sort=sort, limit=limit or 0
+    )
+    if limit:
+        # a whole page in a single round trip
+        cursor.batch_size(limit)
+    # the first batch is fetched here, concurrently with the other collections
+    first = next(cursor, None)
+    return iter([]) if first is None else chain([first], cursor)
+
+
+def find_articles(
+    collections: List[str],
+    mongo_filter: dict,
+    sort: List[Tuple[str, int]],
+    limit: int = None,
+    projection: dict = None,
+) -> Iterator[dict]:
+    """Returns the articles of several collections in the order of the sort
+
+    The collections are queried concurrently and their sorted results are merged
+    lazily with a heap, so that the latency is that of the slowest collection and
+    no article is read past the limit.
+
+    Args:
+        collections (List[str]): categories of the articles
+        mongo_filter (dict): filter of the articles
+        sort (List[Tuple[str, int]]): sort of the articles, see parse_sort
+        limit (int, optional): maximum number of articles, None for all of them.
+            Defaults to None.
+        projection (dict, optional): fields to read, which must include the
+            sort field, None for whole documents. Defaults to None.
+
+    Returns:
+        Iterator[dict]: the articles, in order
+    """
+    futures = [
+        fanout_executor.submit(_open_cursor, c, mongo_filter, sort, limit, projection)
+        for c in collections
+    ]
+    cursors = [future.result() for future in futures]
+    articles = heapq.merge(*cursors, key=get_sort_key(sort), reverse=sort[0][1] < 0)
+    return islice(articles, limit)
+
+
+@router.get(
+    "/data/articles",
+    tags=["Data"],
+    responses={
+        200: {
+            "description": "OK, as NDJSON with Accept: application/x-ndjson",
+            "model": List[Article],
+            "content": {"application/x-ndjson": {}},
+        }
+    },
+)
+def get_articles(
+    response: Response,
+    category: List[str] = Query(default=None),
+    date_start: datetime.datetime = Query(default=None),
+    date_end: datetime.datetime = Query(default=None),
+    sections: List[str] = Query(default=None),
+    stale: bool = Query(
+        default=False,
+        description="Only the articles not anonymized by the current model",
+    ),
+    sort: str = Query(
+        default=DEFAULT_SORT,
+        description=f"One of {SORT_FIELDS}, prefixed with - for the descending "
+        "order",
+    ),
+    limit: int = Query(
+        default=None,
+        ge=1,
+        le=ARTICLES_MAX_PAGE_SIZE,
+        description=f"Maximum number of articles, defaults to {ARTICLES_PAGE_SIZE} "
+        "or to all of them when streaming",
+    ),
+    cursor: str = Query(
+        default=None,
+        description="X-Next-Cursor header of the previous page",
+    ),
+    fields: List[str] = FIELDS_QUERY,
+    accept: str = Header(default="application/json"),
+    current_user: User = Depends(get_current_user),
+):
+    """Lists the articles in the order of sort, by default from the most recently
+    published, one page at a time
+
+    The X-Next-Cursor header of the response, absent on the last page, gives the
+    cursor of the next page.
+
+    With Accept: application/x-ndjson, the articles are streamed as NDJSON as
+    soon as they are read from MongoDB instead, without any X-Next-Cursor."""
+    ROUTE_NAME = "articles.read.multiple"
+    roles = check_user_permissions(
+        username=current_user.username, route_name=ROUTE_NAME
+    )
+    collections = category if category else CATEGORIES
+    try:
+        sort = parse_sort(sort)
+    except ValueError as e:
+        raise HTTPException(422, detail=str(e))
+    projection = get_projection(fields, sort_field=sort[0][0])
+
+    if stale:
+        # the stale articles depend on whether the model is quantized
+        load_model_state(MODEL_NAME)
+    mongo_filter = build_article_filter(
+        sections=sections, date_start=date_start, date_end=date_end, stale_only=stale
+    )
+    if cursor:
+        try:
+            mongo_filter = {"$and": [mongo_filter, build_cursor_filter(cursor, sort)]}
+        except ValueError as e:
+            raise HTTPException(422, detail=str(e))
+
+    if "application/x-ndjson" in accept:
+        # the whole result set is never held in memory
+        lines = (
+            json.dumps(jsonable_encoder(format_article(r, roles, fields))) + "\n"
+            for r in find_articles(collections, mongo_filter, sort, limit, projection)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    # one more article than requested tells whether there is a next page
+    limit = limit or ARTICLES_PAGE_SIZE
+    results = list(
+        find_articles(collections, mongo_filter, sort, limit + 1, projection)
+    )
+
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(results[-1], sort)
+
+    return [format_article(r, roles, fields) for r in results]
+
+
+@router.get(
+    "/data/articles/{category}/{object_id}",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": Article},
+        404: {"description": "Article or category not found"},
+    },
+)
+def get_article(
+    category: str,
+    object_id: str,
+    fields: List[str] = FIELDS_QUERY,
+    current_user: User = Depends(get_current_user),
+):
+    ROUTE_NAME = "articles.read"
+    roles = check_user_permissions(
+        username=current_user.username, route_name=ROUTE_NAME
+    )
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' not found.")
+    projection = get_projection(fields)
+    try:
+        result = article_db[category].find_one(
+            {"_id": bson.objectid.ObjectId(object_id)}, projection=projection
+        )
+    except bson.errors.InvalidId:
+        raise HTTPException(422, detail=f"Id '{object_id}' is not valid.")
+
+    if not result:
+        raise HTTPException(404, detail=f"Article with id '{object_id}' not found.")
+    return format_article(result, roles, fields)
+
+
+@router.post(
+    "/data/articles",
+    tags=["Data"],
+    responses={200: {"description": "OK", "model": Article}},
+)
+def post_new_article(
+    article: NewArticle, current_user: User = Depends(get_current_user)
+):
+    ROUTE_NAME = "articles.create"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    category = article.source
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' does not exist.")
+    insertion_date = datetime.datetime.utcnow()
+    article_data = article.dict()
+    article_data["hash"] = hash(article_data["raw_text"])
+    article_data["events"] = [
+        {
+            "type": "insertion",
+            "author": current_user.username,
+            "date": insertion_date,
+            "mode": "single",
+        }
+    ]
+    result = article_db[category].insert_one(article_data)
+    new_article = article_db[category].find_one(result.inserted_id)
+
+    return Article(**format_object_id(new_article))
+
+
+@router.post(
+    "/data/articles/batch",
+    tags=["Data"],
+    responses={200: {"description": "OK", "model": List[Article]}},
+)
+def post_new_articles_batch(
+    articles_data: List[NewArticle], current_user: User = Depends(get_current_user)
+):
+    ROUTE_NAME = "articles.create.multiple"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    articles = {}
+    insertion_date = datetime.datetime.utcnow()
+    for article in articles_data:
+        article_data = article.dict()
+        category = article.source
+        if category not in CATEGORIES:
+            raise HTTPException(404, detail=f"Category '{category}' does not exist.")
+        article_data = article.dict()
+        article_data["hash"] = hash(article_data["raw_text"])
+        article_data["events"] = [
+            {
+                "type": "insertion",
+                "author": current_user.username,
+                "date": insertion_date,
+                "mode": "batch",
+            }
+        ]
+        articles[category] = articles.get(category, []) + [article_data]
+
+    new_articles = []
+
+    for c in articles:
+        r = article_db[c].insert_many(articles[c])
+        inserted_ids = r.inserted_ids
+        new_articles.extend(article_db[c].find({"_id": {"$in": inserted_ids}}))
+
+    return [Article(**format_object_id(a)) for a in new_articles]
+
+
+@router.delete(
+    "/data/articles/{category}/{object_id}",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK"},
+        404: {"description": "Article or category not found"},
+    },
+)
+def delete_article(
+    category: str, object_id: str, current_user: User = Depends(get_current_user)
+):
+    ROUTE_NAME = "articles.delete"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' not found.")
+    result = article_db[category].delete_one(
+        filter={"_id": bson.objectid.ObjectId(object_id)}
+    )
+    if result.deleted_count == 0:
+        raise HTTPException(404, detail=f"Object with id '{object_id}' not found.")
+    return {"message": "object deleted"}
+
+
+@router.put(
+    "/data/articles/{category}/{object_id}",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": Article},
+        404: {"description": "Article or category not found"},
+    },
+)
+def update_article_data(
+    category: str,
+    object_id: str,
+    new_article: UpdateArticleData,
+    current_user: User = Depends(get_current_user),
+):
+    ROUTE_NAME = "articles.update"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    object_id = bson.objectid.ObjectId(object_id)
+
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' not found.")
+
+    old_article = article_db[category].find_one(
+        filter={"_id": object_id},
+        projection={
+            "events": 1,
+            "raw_text": 1,
+            "auto_anonymized_text": 1,
+            "auto_anonymized_sentences": 1,
+            "auto_anonymized_model": 1,
+            "_id": 0,
+        },
+    )
+
+    if not old_article:
+        raise HTTPException(404, detail=f"Object with id '{object_id}' not found.")
+
+    date = datetime.datetime.utcnow()
+    new_article_data = new_article.dict(exclude_unset=True)
+    new_article_data["events"] = old_article["events"] + [
+        {"type": "modification", "author": current_user.username, "date": date}
+    ]
+
+    raw_text = new_article_data.get("raw_text")
+    if (
+        raw_text is not None
+        and raw_text != old_article.get("raw_text")
+        and "auto_anonymized_text" in old_article
+    ):
+        # the existing automatic anonymization is refreshed with the same model,
+        # only tagging the edited sentences
+        model_name = old_article.get("auto_anonymized_model", MODEL_NAME)
+        new_article_data.update(
+            auto_anonymize_fields(
+                raw_text=raw_text,
+                model_name=model_name,
+                previous_article=old_article,
+            )
+        )
+        new_article_data["events"].append(
+            build_auto_anonymization_event(
+                date=date,
+                author=current_user.username,
+                model_name=model_name,
+                mode="incremental",
+            )
+        )
+
+    article_db[category].update_one(
+        filter={"_id": object_id}, update={"$set": new_article_data}
+    )
+
+    final_data = article_db[category].find_one(filter={"_id": object_id})
+
+    return Article(**format_object_id(final_data))
+
+
+@router.put(
+    "/data/articles/{category}/{object_id}/auto",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": Article},
+        404: {"description": "Article or category not found"},
+    },
+)
+def put_auto_anonymized_article(
+    object_id: str,
+    category: str,
+    model: str = Query(default=MODEL_NAME, description=f"One of {MODEL_ALLOWED_NAMES}"),
+    current_user: User = Depends(get_current_user),
+):
+    """Generates the automatic anonymization of the specified article"""
+    ROUTE_NAME = "articles.auto_alias"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    check_model_name(model)
+
+    object_id = bson.objectid.ObjectId(object_id)
+
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' not found.")
+
+    # concurrent requests for the same article share a single anonymization
+    return auto_anonymization_flights.do(
+        (category, object_id, model),
+        lambda: auto_anonymize_article(
+            category=category,
+            object_id=object_id,
+            model_name=model,
+            author=current_user.username,
+        ),
+    )
+
+
+@router.put(
+    "/data/articles/{category}/{object_id}/manual",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": Article},
+        404: {"description": "Article or category not found"},
+    },
+)
+def put_manual_anonymized_article(
+    object_id: str,
+    category: str,
+    anonymized_data: ManualAnonymizedData,
+    current_user: User = Depends(get_current_user),
+):
+    """Generates the automatic manual of the specified article"""
+    ROUTE_NAME = "articles.manual_alias"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    object_id = bson.objectid.ObjectId(object_id)
+
+    if category not in CATEGORIES:
+        raise HTTPException(404, detail=f"Category '{category}' not found.")
+
+    old_article = article_db[category].find_one(
+        filter={"_id": object_id}, projection={"events": 1, "_id": 0}
+    )
+
+    if not old_article:
+        raise HTTPException(404, detail=f"Object with id '{object_id}' not found.")
+
+    new_data = {
+        "manual_anonymized_text": anonymized_data.manual_anonymized_text,
+        "manual_anonymized_aliases": anonymized_data.dict()[
+            "manual_anonymized_aliases"
+        ],
+    }
+    new_data["events"] = old_article["events"] + [
+        {
+            "type": "manual_anonymization",
+            "date": datetime.datetime.utcnow(),
+            "author": current_user.username,
+        }
+    ]
+
+    article_db[category].update_one(
+        filter={"_id": object_id}, update={"$set": new_data}
+    )
+
+    result = article_db[category].find_one(filter={"_id": object_id})
+
+    return Article(**format_object_id(result))
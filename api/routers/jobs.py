@@ -0,0 +1,108 @@
+import bson
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+
+from .. import jobs
+from ..authentication import User
+from ..config import CATEGORIES
+from ..dependencies import check_user_permissions
+from ..dependencies import get_current_user
+from ..models import AutoAnonymizationJob
+from ..models import AutoAnonymizationJobFilters
+
+router = APIRouter()
+
+ROUTE_NAME = "articles.auto_alias.multiple"
+
+
+def parse_job_id(job_id: str) -> bson.ObjectId:
+    try:
+        return bson.objectid.ObjectId(job_id)
+    except bson.errors.InvalidId:
+        raise HTTPException(422, detail=f"Id '{job_id}' is not valid.")
+
+
+@router.post(
+    "/data/articles/auto-jobs",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": AutoAnonymizationJob},
+        404: {"description": "Category not found"},
+    },
+)
+def post_auto_anonymization_job(
+    filters: AutoAnonymizationJobFilters,
+    current_user: User = Depends(get_current_user),
+):
+    """Starts the automatic anonymization of the articles matching the filters"""
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    for category in filters.category or []:
+        if category not in CATEGORIES:
+            raise HTTPException(404, detail=f"Category '{category}' not found.")
+
+    job = jobs.create_job(filters=filters.dict(), author=current_user.username)
+    jobs.start_job(job["_id"])
+
+    return AutoAnonymizationJob(**jobs.format_job(job))
+
+
+@router.get(
+    "/data/articles/auto-jobs/{job_id}",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": AutoAnonymizationJob},
+        404: {"description": "Job not found"},
+    },
+)
+def get_auto_anonymization_job(
+    job_id: str, current_user: User = Depends(get_current_user)
+):
+    """Returns the status and progress of an automatic anonymization job"""
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    job = jobs.job_collection.find_one({"_id": parse_job_id(job_id)})
+    if not job:
+        raise HTTPException(404, detail=f"Job with id '{job_id}' not found.")
+    return AutoAnonymizationJob(**jobs.format_job(job))
+
+
+@router.delete(
+    "/data/articles/auto-jobs/{job_id}",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": AutoAnonymizationJob},
+        404: {"description": "Job not found"},
+    },
+)
+def cancel_auto_anonymization_job(
+    job_id: str, current_user: User = Depends(get_current_user)
+):
+    """Cancels an automatic anonymization job after its current chunk"""
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    job = jobs.cancel_job(parse_job_id(job_id))
+    if not job:
+        raise HTTPException(404, detail=f"Job with id '{job_id}' not found.")
+    return AutoAnonymizationJob(**jobs.format_job(job))
+
+
+@router.post(
+    "/data/articles/auto-jobs/{job_id}/resume",
+    tags=["Data"],
+    responses={
+        200: {"description": "OK", "model": AutoAnonymizationJob},
+        404: {"description": "Job not found"},
+        409: {"description": "Job cannot be resumed"},
+    },
+)
+def resume_auto_anonymization_job(
+    job_id: str, current_user: User = Depends(get_current_user)
+):
+    """Resumes a failed, cancelled or interrupted job where it stopped"""
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+    object_id = parse_job_id(job_id)
+    job = jobs.resume_job(object_id)
+    if not job:
+        if not jobs.job_collection.find_one({"_id": object_id}):
+            raise HTTPException(404, detail=f"Job with id '{job_id}' not found.")
+        raise HTTPException(409, detail=f"Job with id '{job_id}' cannot be resumed.")
+    return AutoAnonymizationJob(**jobs.format_job(job))
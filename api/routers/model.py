@@ -0,0 +1,179 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
+
+from ..aliasing_model import replace_text
+from ..config import ANONYMIZED_ALIASES_DESCRIPTION
+from ..config import MODEL_ALLOWED_NAMES
+from ..config import MODEL_INTERACTIVE_NAME
+from ..dependencies import check_model_name
+from ..inference import compute_entities
+from ..inference import compute_entities_batch
+from ..inference import is_model_ready
+from ..inference import list_models
+from ..models import Alias
+from ..models import AliasDescription
+from ..models import AnonymizedTextWithAliases
+from ..models import Text
+from ..models import TextBatch
+from ..streaming import anonymize_stream
+from ..streaming import NDJSONStreamingResponse
+from ..utils import format_aliases
+
+router = APIRouter()
+
+MODEL_QUERY = Query(
+    default=MODEL_INTERACTIVE_NAME, description=f"One of {MODEL_ALLOWED_NAMES}"
+)
+
+
+@router.get(
+    "/ready",
+    tags=["Model"],
+    responses={
+        200: {"description": "Model is loaded"},
+        503: {"description": "Model is still loading"},
+    },
+)
+def get_ready():
+    """Returns whether the model is warm and ready to serve requests"""
+    if not is_model_ready():
+        raise HTTPException(
+            503, detail=f"Model '{MODEL_INTERACTIVE_NAME}' is still loading."
+        )
+    return {"ready": True, "models": list_models()}
+
+
+@router.get(
+    "/models",
+    tags=["Model"],
+    responses={200: {"description": "OK"}},
+)
+def get_models():
+    """Returns the loaded models with their size (in bytes), least recently used
+    first"""
+    return list_models()
+
+
+@router.get(
+    "/aliases",
+    tags=["Model"],
+    responses={200: {"description": "OK", "model": List[AliasDescription]}},
+)
+def get_aliases():
+    """Returns the list of aliases that are anonymized and their description"""
+    return [
+        AliasDescription(text=k, alias=v)
+        for k, v in ANONYMIZED_ALIASES_DESCRIPTION.items()
+    ]
+
+
+@router.get(
+    "/aliases/{alias}",
+    tags=["Model"],
+    responses={
+        200: {"description": "OK", "model": AliasDescription},
+        404: {"description": "Not found"},
+    },
+)
+def get_alias(alias: str):
+    if alias not in ANONYMIZED_ALIASES_DESCRIPTION:
+        raise HTTPException(404, detail=f"Alias ID '{alias}' not found")
+    return AliasDescription(
+        alias=alias, description=ANONYMIZED_ALIASES_DESCRIPTION[alias]
+    )
+
+
+@router.post(
+    "/model/aliases",
+    tags=["Model"],
+    responses={200: {"description": "OK", "model": List[Alias]}},
+)
+def post_get_named_entities(text: Text, model: str = MODEL_QUERY):
+    check_model_name(model)
+    entities = compute_entities(raw_text=text.text, model_name=model)
+    return [Alias(text=k, alias=v) for k, v in entities.items()]
+
+
+@router.post(
+    "/model/anonymize",
+    tags=["Model"],
+    responses={200: {"description": "OK", "model": AnonymizedTextWithAliases}},
+)
+def post_anonymize_text(text: Text, model: str = MODEL_QUERY):
+    check_model_name(model)
+    raw_text = text.text
+
+    aliases = compute_entities(raw_text=raw_text, model_name=model)
+
+    new_text = replace_text(raw_text=raw_text, entities=aliases)
+
+    response = AnonymizedTextWithAliases(
+        raw_text=raw_text,
+        anonymized_text=new_text,
+        aliases=[Alias(**a) for a in format_aliases(aliases)],
+    )
+    return response
+
+
+@router.post(
+    "/model/aliases/batch",
+    tags=["Model"],
+    responses={200: {"description": "OK", "model": List[List[Alias]]}},
+)
+def post_get_named_entities_batch(batch: TextBatch, model: str = MODEL_QUERY):
+    """Returns the aliases of each text, in order
+
+    The sentences of all the texts are tagged together while aliases are
+    numbered independently for each text.
+    """
+    check_model_name(model)
+    entities_list = compute_entities_batch(raw_texts=batch.texts, model_name=model)
+    return [
+        [Alias(text=k, alias=v) for k, v in entities.items()]
+        for entities in entities_list
+    ]
+
+
+@router.post(
+    "/model/anonymize/batch",
+    tags=["Model"],
+    responses={200: {"description": "OK", "model": List[AnonymizedTextWithAliases]}},
+)
+def post_anonymize_text_batch(batch: TextBatch, model: str = MODEL_QUERY):
+    """Anonymizes each text, in order, tagging all their sentences together"""
+    check_model_name(model)
+    entities_list = compute_entities_batch(raw_texts=batch.texts, model_name=model)
+    return [
+        AnonymizedTextWithAliases(
+            raw_text=raw_text,
+            anonymized_text=replace_text(raw_text=raw_text, entities=aliases),
+            aliases=[Alias(**a) for a in format_aliases(aliases)],
+        )
+        for raw_text, aliases in zip(batch.texts, entities_list)
+    ]
+
+
+@router.post(
+    "/model/anonymize/stream",
+    tags=["Model"],
+    responses={
+        200: {
+            "description": "NDJSON stream of AnonymizedTextWithAliases",
+            "content": {"application/x-ndjson": {}},
+        }
+    },
+)
+async def post_anonymize_text_stream(request: Request, model: str = MODEL_QUERY):
+    """Anonymizes a newline-delimited JSON stream of Text records
+
+    Results are streamed back as NDJSON, in input order, while the request body
+    is still being read. Invalid records are reported inline as
+    {"line": ..., "error": ...} lines. Clients sending large bodies should read
+    the response while they are still sending.
+    """
+    check_model_name(model)
+    return NDJSONStreamingResponse(anonymize_stream(request.stream(), model))
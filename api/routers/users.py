@@ -0,0 +1,192 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+
+from ..authentication import check_user
+from ..authentication import check_valid_password
+from ..authentication import encrypt_password
+from ..authentication import signJWT
+from ..authentication import User
+from ..authentication import UserData
+from ..authentication import UserLogin
+from ..database import user_collection
+from ..dependencies import check_user_permissions
+from ..dependencies import get_current_user
+
+router = APIRouter()
+
+
+@router.get("/users/me", tags=["Users"])
+async def read_users_me(current_user: User = Depends(get_current_user)):
+    return current_user
+
+
+@router.post(
+    "/users/signup",
+    tags=["Users"],
+    responses={
+        200: {"description": "OK"},
+        409: {"description": "Username already taken."},
+        401: {"description": "Password is not valid."},
+    },
+)
+def create_user(user: UserLogin):
+    new_user = user.dict()
+    new_user["roles"] = ["public"]
+
+    previous_user = user_collection.find_one(filter={"username": user.username})
+    if previous_user:
+        raise HTTPException(409, detail=f"Username '{user.username}' already taken.")
+    if not check_valid_password(user.password):
+        raise HTTPException(401, detail="Password is not valid.")
+
+    new_user["password"] = encrypt_password(new_user["password"])
+
+    user_collection.insert_one(new_user)
+
+    return signJWT(user.username)
+
+
+@router.post(
+    "/users/signin",
+    tags=["Users"],
+    responses={
+        200: {"description": "OK"},
+        401: {"description": "Username or credentials are not valid."},
+    },
+)
+def user_login(user: UserLogin):
+    if check_user(user, collection=user_collection):
+        return signJWT(user.username)
+    raise HTTPException(401, detail="Username or credentials are not valid.")
+
+
+@router.get(
+    "/users",
+    tags=["User Administration"],
+    responses={200: {"description": "OK", "model": List[User]}},
+)
+def get_users(current_user: User = Depends(get_current_user)):
+    ROUTE_NAME = "users.read.multiple"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    return [
+        User(**a) for a in user_collection.find(filter={}, projection={"password": 0})
+    ]
+
+
+@router.get(
+    "/users/{username}",
+    tags=["User Administration"],
+    responses={
+        200: {"description": "OK", "model": User},
+        404: {"description": "User not found."},
+    },
+)
+def get_user(username: str, current_user: User = Depends(get_current_user)):
+    ROUTE_NAME = "users.read"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    user = user_collection.find_one(
+        filter={"username": username}, projection={"password": 0}
+    )
+    if not user:
+        raise HTTPException(404, detail=f"User '{username} not found.")
+
+    return User(**user)
+
+
+@router.delete(
+    "/users/{username}",
+    tags=["User Administration"],
+    responses={200: {"description": "OK"}, 404: {"description": "User not found."}},
+)
+def delete_user(username: str, current_user: User = Depends(get_current_user)):
+    ROUTE_NAME = "users.delete"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    user = user_collection.find_one(
+        filter={"username": username}, projection={"password": 0}
+    )
+    if not user:
+        raise HTTPException(404, detail=f"User '{username} not found.")
+    user_collection.delete_one(filter={"username": username})
+
+    return {"message": "object deleted"}
+
+
+@router.post(
+    "/users",
+    tags=["User Administration"],
+    responses={
+        200: {"description": "OK", "model": User},
+        409: {"description": "Username already taken."},
+        401: {"description": "Password is not valid."},
+    },
+)
+def post_user(user_data: User, current_user: User = Depends(get_current_user)):
+    ROUTE_NAME = "users.create"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    previous_user = user_collection.find_one(filter={"username": user_data.username})
+    if previous_user:
+        raise HTTPException(
+            409, detail=f"Username '{user_data.username}' already taken."
+        )
+    if not check_valid_password(user_data.password):
+        raise HTTPException(401, detail="Password is not valid.")
+
+    data_dict = user_data.dict()
+    data_dict["password"] = encrypt_password(data_dict["password"])
+
+    user_collection.insert_one(data_dict)
+
+    new_user = user_collection.find_one(
+        filter={"username": user_data.username}, projection={"password": 0}
+    )
+
+    return User(**new_user)
+
+
+@router.put(
+    "/users/{username}",
+    tags=["User Administration"],
+    responses={
+        200: {"description": "OK", "model": User},
+        404: {"description": "User not found."},
+    },
+)
+def update_user(
+    username: str,
+    new_user_data: UserData,
+    current_user: User = Depends(get_current_user),
+):
+    ROUTE_NAME = "users.update"
+    check_user_permissions(username=current_user.username, route_name=ROUTE_NAME)
+
+    user = user_collection.find_one(
+        filter={"username": username}, projection={"password": 0}
+    )
+    if not user:
+        raise HTTPException(404, detail=f"User '{username} not found.")
+
+    new_password = new_user_data.password
+    new_user_data_dict = new_user_data.dict(exclude_unset=True)
+
+    if new_password:
+        if not check_valid_password(new_password):
+            raise HTTPException(401, detail="Password is not valid.")
+
+        new_user_data_dict["password"] = encrypt_password(new_password)
+
+    user_collection.update_one(
+        filter={"username": username}, update={"$set": new_user_data_dict}
+    )
+
+    user = user_collection.find_one(
+        filter={"username": username}, projection={"password": 0}
+    )
+
+    return User(**user)
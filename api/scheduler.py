@@ -0,0 +1,230 @@
+import contextvars
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterable
+from typing import Iterator
+
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+# lanes by decreasing priority
+LANES = ("interactive", "bulk")
+
+QUEUE_DEPTH = Gauge(
+    "inference_queue_depth",
+    "Predictions waiting to run",
+    ["lane"],
+)
+QUEUE_WAIT = Histogram(
+    "inference_queue_wait_seconds",
+    "Time spent by the predictions waiting to run",
+    ["lane"],
+)
+
+# lane of the predictions of the current thread, read by BatchingTagger
+current_lane = contextvars.ContextVar("inference_lane", default="interactive")
+
+
+def estimate_cost(texts: Iterable[str]) -> int:
+    """Returns the estimated cost of tagging the texts, their number of tokens"""
+    return sum(len(text.split()) for text in texts)
+
+
+@contextmanager
+def use_lane(lane: str) -> Iterator[None]:
+    """Runs the predictions made in the context in the lane"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown inference lane '{lane}'.")
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+class _Entry:
+    def __init__(self, item, lane: str, cost: int, sequence: int):
+        self.item = item
+        self.lane = lane
+        self.cost = cost
+        self.sequence = sequence
+        self.enqueued = time.monotonic()
+        self.popped = False
+
+
+class _LaneHeap:
+    """Items served by lane priority then by cost, an item waiting for longer
+    than the starvation deadline going before all the others, oldest first.
+    Not thread-safe."""
+
+    def __init__(self, starvation_deadline: float):
+        self.starvation_deadline = starvation_deadline
+
+        self._waiting = {lane: 0 for lane in LANES}
+        # entries by (lane priority, cost, arrival) and by arrival, the popped
+        # ones being removed lazily from both
+        self._heap = []
+        self._arrivals = deque()
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(self._waiting.values())
+
+    def push(self, item, lane: str, cost: int):
+        if lane not in LANES:
+            raise ValueError(f"Unknown inference lane '{lane}'.")
+        entry = _Entry(item, lane, cost, next(self._sequence))
+        heapq.heappush(self._heap, (LANES.index(lane), cost, entry.sequence, entry))
+        self._arrivals.append(entry)
+        self._waiting[lane] += 1
+        QUEUE_DEPTH.labels(lane).inc()
+
+    def _pop_entry(self, now: float) -> _Entry:
+        while self._arrivals[0].popped:
+            self._arrivals.popleft()
+        oldest = self._arrivals[0]
+        if now - oldest.enqueued >= self.starvation_deadline:
+            self._arrivals.popleft()
+            return oldest
+
+        while True:
+            _, _, _, entry = heapq.heappop(self._heap)
+            if not entry.popped:
+                return entry
+
+    def pop(self):
+        """Removes and returns the next item, there must be at least one"""
+        now = time.monotonic()
+        entry = self._pop_entry(now)
+        entry.popped = True
+        self._waiting[entry.lane] -= 1
+        QUEUE_DEPTH.labels(entry.lane).dec()
+        QUEUE_WAIT.labels(entry.lane).observe(now - entry.enqueued)
+        if not len(self):
+            self._heap.clear()
+            self._arrivals.clear()
+        return entry.item
+
+    def depth(self, lane: str) -> int:
+        return self._waiting[lane]
+
+
+class LaneQueue:
+    """Thread-safe queue serving its items in the order of InferenceScheduler:
+    interactive lane first, cheapest first, and starving items before all"""
+
+    def __init__(self, starvation_deadline: float = 5):
+        """
+        Args:
+            starvation_deadline (float, optional): time (in seconds) after which
+                a waiting item is served first. Defaults to 5.
+        """
+        self._heap = _LaneHeap(starvation_deadline)
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item, lane: str = "interactive", cost: int = 0):
+        with self._condition:
+            self._heap.push(item, lane, cost)
+            self._condition.notify()
+
+    def get(self, timeout: float = None):
+        """Removes and returns the next item, waiting at most timeout seconds
+
+        Returns:
+            the next item, None once the queue is closed and empty
+
+        Raises:
+            queue.Empty: if no item was queued before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not len(self._heap):
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._condition.wait(remaining)
+            return self._heap.pop()
+
+    def close(self):
+        """Makes get return None once the queued items are served"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def depth(self, lane: str) -> int:
+        """Returns the number of items of the lane waiting in the queue"""
+        with self._condition:
+            return self._heap.depth(lane)
+
+
+class InferenceScheduler:
+    """Limits the number of predictions running at the same time and decides
+    which waiting prediction runs next.
+
+    The interactive lane goes before the bulk lane, and within a lane the
+    cheapest prediction goes first. A prediction waiting for longer than the
+    starvation deadline goes before all the others, oldest first.
+    """
+
+    def __init__(self, slots: int = 2, starvation_deadline: float = 5):
+        """
+        Args:
+            slots (int, optional): number of predictions running at the same
+                time. Defaults to 2.
+            starvation_deadline (float, optional): time (in seconds) after which
+                a waiting prediction is served first. Defaults to 5.
+        """
+        self.slots = slots
+        self.starvation_deadline = starvation_deadline
+
+        self._running = 0
+        self._heap = _LaneHeap(starvation_deadline)
+        self._condition = threading.Condition()
+
+    def _dispatch(self):
+        """Grants the free slots to the next waiters. Must be called with the
+        lock held."""
+        granted = False
+        while self._running < self.slots and len(self._heap):
+            self._heap.pop().set()
+            self._running += 1
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, lane: str = "interactive", cost: int = 0) -> Iterator[None]:
+        """Waits for an inference slot and holds it while in the context
+
+        Args:
+            lane (str, optional): "interactive" or "bulk".
+                Defaults to "interactive".
+            cost (int, optional): estimated cost of the prediction, see
+                estimate_cost. Defaults to 0.
+        """
+        granted = threading.Event()
+        with self._condition:
+            self._heap.push(granted, lane, cost)
+            self._dispatch()
+            while not granted.is_set():
+                self._condition.wait()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._dispatch()
+
+    def depth(self, lane: str) -> int:
+        """Returns the number of predictions of the lane waiting for a slot"""
+        with self._condition:
+            return self._heap.depth(lane)
@@ -0,0 +1,71 @@
+import threading
+from typing import Callable
+from typing import Hashable
+
+from prometheus_client import Counter
+
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Requests that waited for an identical computation already in progress",
+    ["group"],
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent computations sharing the same key
+
+    The first caller for a key runs the computation, the callers arriving while
+    it is in progress wait for it and get the same result (or exception).
+    Nothing is kept once the computation is done.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): name of the group, used as the label of the metric
+        """
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, compute: Callable[[], object]) -> object:
+        """Runs compute, unless a computation with the same key is in progress
+
+        Args:
+            key (Hashable): key identifying the computation
+            compute (Callable[[], object]): function computing the result
+
+        Returns:
+            object: result of the computation
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.labels(self.name).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,93 @@
+import functools
+import hashlib
+import importlib.metadata
+import json
+
+from .config import ANONYMIZATION_VERSION
+from .config import ANONYMIZED_ALIASES
+from .config import INFERENCE_QUANTIZE
+from .config import SEGMENT_MAX_TOKENS
+from .config import SEGMENT_OVERLAP_TOKENS
+
+FINGERPRINT_FIELD = "auto_anonymized_fingerprint"
+TEXT_HASH_FIELD = "auto_anonymized_text_hash"
+
+# whether int8 quantization was applied to the models loaded by this process or
+# by its worker processes, set by record_model_state
+_quantized_models = {}
+
+
+def record_model_state(model_name: str, info: dict):
+    """Records whether a loaded model is quantized, as described by load_tagger:
+    with INFERENCE_QUANTIZE, the model stays float32 if the quantized model does
+    not agree enough with it"""
+    _quantized_models[model_name] = bool(info.get("quantized"))
+
+
+def is_model_state_known(model_name: str) -> bool:
+    """Returns whether the fingerprint of the model is known without loading it"""
+    return not INFERENCE_QUANTIZE or model_name in _quantized_models
+
+
+def get_model_fingerprint(model_name: str) -> str:
+    """Returns a digest of everything that determines the output of the automatic
+    anonymization besides the text: model as loaded, library version and
+    configuration
+
+    Bump ANONYMIZATION_VERSION when the anonymization code changes its output.
+
+    Args:
+        model_name (str): name of the model
+
+    Returns:
+        str: hexadecimal digest
+    """
+    return _get_model_fingerprint(model_name, _quantized_models.get(model_name, False))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_model_fingerprint(model_name: str, quantized: bool) -> str:
+    try:
+        flair_version = importlib.metadata.version("flair")
+    except importlib.metadata.PackageNotFoundError:
+        flair_version = None
+
+    configuration = {
+        "model": model_name,
+        "flair": flair_version,
+        "aliases": sorted(ANONYMIZED_ALIASES),
+        "segment_max_tokens": SEGMENT_MAX_TOKENS,
+        "segment_overlap_tokens": SEGMENT_OVERLAP_TOKENS,
+        "quantized": quantized,
+        "version": ANONYMIZATION_VERSION,
+    }
+    return hashlib.blake2b(
+        json.dumps(configuration, sort_keys=True).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def get_text_hash(raw_text: str) -> str:
+    """Returns a digest of the text, stable across processes unlike hash()"""
+    return hashlib.blake2b(raw_text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_stamp(raw_text: str, model_name: str) -> dict:
+    """Returns the fields recording what produced an automatic anonymization"""
+    return {
+        FINGERPRINT_FIELD: get_model_fingerprint(model_name),
+        TEXT_HASH_FIELD: get_text_hash(raw_text),
+    }
+
+
+def is_up_to_date(article: dict, model_name: str) -> bool:
+    """Returns whether the automatic anonymization of the article was produced by
+    the current model and configuration from its current raw_text"""
+    return article.get(FINGERPRINT_FIELD) == get_model_fingerprint(
+        model_name
+    ) and article.get(TEXT_HASH_FIELD) == get_text_hash(article["raw_text"])
+
+
+def build_stale_filter(model_name: str) -> dict:
+    """Returns the MongoDB filter selecting the articles that were not anonymized
+    with the current model and configuration, indexed by api/indexes.py"""
+    return {FINGERPRINT_FIELD: {"$ne": get_model_fingerprint(model_name)}}
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from typing import AsyncIterator
+from typing import Optional
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from .aliasing_model import replace_text
+from .config import MODEL_INTERACTIVE_NAME
+from .config import STREAM_BATCH_SIZE
+from .config import STREAM_MAX_LINE_BYTES
+from .config import STREAM_QUEUE_SIZE
+from .inference import compute_entities_batch
+from .models import Alias
+from .models import AnonymizedTextWithAliases
+from .models import Text
+from .utils import format_aliases
+
+_END = object()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streaming response that does not listen for the client disconnection
+
+    StreamingResponse consumes the request messages while it waits for the
+    disconnection, which would steal the request body we are still reading.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def read_lines(
+    chunks: AsyncIterator[bytes], max_line_size: int = STREAM_MAX_LINE_BYTES
+) -> AsyncIterator[Optional[bytes]]:
+    """Yields the lines of a stream of bytes
+
+    Args:
+        chunks (AsyncIterator[bytes]): stream of bytes, like Request.stream()
+        max_line_size (int, optional): maximum size of a line, longer lines are
+            skipped and replaced with None. Defaults to STREAM_MAX_LINE_BYTES.
+
+    Yields:
+        Optional[bytes]: lines without their line break
+    """
+    buffer = b""
+    skipping = False
+
+    async for chunk in chunks:
+        buffer += chunk
+
+        while b"\n" in buffer:
+            line, _, buffer = buffer.partition(b"\n")
+            if skipping:
+                skipping = False
+            else:
+                yield line
+
+        if not skipping and len(buffer) > max_line_size:
+            yield None
+            skipping = True
+        if skipping:
+            buffer = b""
+
+    if buffer and not skipping:
+        yield buffer
+
+
+async def _read_records(chunks: AsyncIterator[bytes], queue: asyncio.Queue):
+    index = 0
+    try:
+        async for line in read_lines(chunks):
+            if line is not None and not line.strip():
+                continue
+
+            text, error = None, None
+            if line is None:
+                error = "Line is too long."
+            else:
+                try:
+                    text = Text.parse_raw(line).text
+                except ValidationError as e:
+                    error = str(e)
+
+            # blocks when the pipeline is full, which stops reading the body
+            await queue.put((index, text, error))
+            index += 1
+    finally:
+        await queue.put(_END)
+
+
+async def anonymize_stream(
+    chunks: AsyncIterator[bytes], model_name: str = MODEL_INTERACTIVE_NAME
+) -> AsyncIterator[str]:
+    """Anonymizes a stream of newline-delimited JSON Text records
+
+    Records are read while previous ones are being processed, through a bounded
+    queue, then anonymized in batches of at most STREAM_BATCH_SIZE records.
+    Results are emitted in input order as NDJSON lines; invalid records and
+    failed batches produce {"line": ..., "error": ...} lines.
+
+    Args:
+        chunks (AsyncIterator[bytes]): request body, like Request.stream()
+        model_name (str, optional): name of the model.
+            Defaults to MODEL_INTERACTIVE_NAME.
+
+    Yields:
+        str: NDJSON lines
+    """
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    reader = asyncio.create_task(_read_records(chunks, queue))
+
+    try:
+        done = False
+        while not done:
+            batch = [await queue.get()]
+            while len(batch) < STREAM_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is _END:
+                batch.pop()
+                done = True
+
+            texts = [text for _, text, error in batch if error is None]
+            entities_list, batch_error = [], None
+            if texts:
+                try:
+                    entities_list = await run_in_threadpool(
+                        compute_entities_batch,
+                        texts,
+                        model_name=model_name,
+                        lane="bulk",
+                    )
+                except Exception as e:
+                    batch_error = str(e)
+
+            entities_iterator = iter(entities_list)
+            for index, text, error in batch:
+                error = error or batch_error
+                if error is not None:
+                    yield json.dumps({"line": index, "error": error}) + "\n"
+                    continue
+                aliases = next(entities_iterator)
+                result = AnonymizedTextWithAliases(
+                    raw_text=text,
+                    anonymized_text=replace_text(raw_text=text, entities=aliases),
+                    aliases=[Alias(**a) for a in format_aliases(aliases)],
+                )
+                yield result.json() + "\n"
+    finally:
+        reader.cancel()
@@ -1,3 +1,14 @@
+import datetime
+from typing import List
+
+from .aliasing_model import replace_text
+from .config import MODEL_NAME
+from .models import Article
+from .stamps import build_stale_filter
+from .stamps import get_model_fingerprint
+from .stamps import get_stamp
+
+
 def format_object_id(record):
     record["object_id"] = str(record["_id"])
     return record
@@ -12,6 +23,60 @@ def format_aliases(aliases: dict):
     return formatted_aliases
 
 
+def build_auto_anonymization(
+    raw_text: str, aliases: dict, sentences: List[dict], model_name: str
+) -> dict:
+    """Returns the automatic anonymization fields of an article
+
+    Args:
+        raw_text (str): text of the article
+        aliases (dict): aliases of its entities
+        sentences (List[dict]): entities of its sentences, see
+            aliasing_model.get_entities_incremental
+        model_name (str): name of the model
+
+    Returns:
+        dict: fields to set on the article
+    """
+    return {
+        "auto_anonymized_text": replace_text(raw_text=raw_text, entities=aliases),
+        "auto_anonymized_aliases": format_aliases(aliases),
+        "auto_anonymized_sentences": sentences,
+        "auto_anonymized_model": model_name,
+        **get_stamp(raw_text, model_name),
+    }
+
+
+def build_auto_anonymization_event(
+    date, author: str, model_name: str, mode: str = None, job_id=None
+) -> dict:
+    """Returns the event recording an automatic anonymization of an article
+
+    Args:
+        date (datetime.datetime): date of the anonymization
+        author (str): user or worker anonymizing the article
+        model_name (str): name of the model
+        mode (str, optional): "batch", "incremental"... Defaults to None.
+        job_id (ObjectId, optional): job anonymizing the article.
+            Defaults to None.
+
+    Returns:
+        dict: event to append to the events of the article
+    """
+    event = {
+        "type": "auto_anonymization",
+        "date": date,
+        "author": author,
+        "model": model_name,
+        "fingerprint": get_model_fingerprint(model_name),
+    }
+    if mode is not None:
+        event["mode"] = mode
+    if job_id is not None:
+        event["job_id"] = str(job_id)
+    return event
+
+
 def mask_texts(record, roles):
     for r in roles:
         if r in ["admin", "contributor", "corrector"]:
@@ -30,3 +95,57 @@ def mask_texts(record, roles):
         for a in new_record.get("manual_anonymized_aliases", [])
     ]
     return new_record
+
+
+def build_article_filter(
+    sections: list = None,
+    date_start: datetime.datetime = None,
+    date_end: datetime.datetime = None,
+    stale_only: bool = False,
+) -> dict:
+    """Returns the MongoDB filter selecting articles by section and date, and
+    optionally only the articles not anonymized by the current model and
+    configuration"""
+    mongo_filter = {}
+
+    if sections:
+        mongo_filter["section"] = {"$in": sections}
+
+    if date_start:
+        if date_end:
+
+            mongo_filter["date_published"] = {"$gt": date_start, "$lt": date_end}
+        else:
+            mongo_filter["date_published"] = {"$gt": date_start}
+    else:
+        if date_end:
+            mongo_filter["date_published"] = {"$lt": date_end}
+
+    if stale_only:
+        mongo_filter.update(build_stale_filter(MODEL_NAME))
+
+    return mongo_filter
+
+
+def parse_fields(fields: List[str]) -> List[str]:
+    """Returns the fields of Article requested with the fields parameter, given
+    either repeated or separated by commas
+
+    Raises:
+        ValueError: if a field is not a field of Article
+    """
+    fields = [f.strip() for value in fields for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in Article.__fields__]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields {unknown}, expected {list(Article.__fields__)}."
+        )
+    return fields
+
+
+def build_projection(fields: List[str], sort_field: str = "date_published") -> dict:
+    """Returns the MongoDB projection reading only the requested fields of the
+    articles, along with the _id and the field used to sort them"""
+    projection = {f: 1 for f in fields if f != "object_id"}
+    projection[sort_field] = 1
+    return projection
@@ -0,0 +1,236 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from typing import Tuple
+
+from .aliasing_model import get_entities
+from .aliasing_model import get_entities_batch
+from .aliasing_model import get_entities_incremental_batch
+from .loading import load_tagger
+from .registry import ModelRegistry
+
+# models of the current worker process, set by _init_worker
+_registry = None
+
+
+def _init_worker(model_name: str, num_threads: int, memory_budget: int):
+    global _registry
+
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _registry = ModelRegistry(loader=load_tagger, memory_budget=memory_budget)
+    _registry.load(model_name)
+
+
+def _get_entities(raw_text: str, aliases_to_anonymize: list, model_name: str) -> dict:
+    with _registry.use(model_name) as model:
+        return get_entities(
+            tagger=model.tagger,
+            raw_text=raw_text,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+        )
+
+
+def _get_models() -> List[dict]:
+    return _registry.describe()
+
+
+def _load_model(model_name: str) -> dict:
+    with _registry.use(model_name) as model:
+        return model.info
+
+
+def _get_entities_batch(
+    raw_texts: List[str],
+    aliases_to_anonymize: list,
+    mini_batch_size: int,
+    model_name: str,
+) -> list:
+    with _registry.use(model_name) as model:
+        return get_entities_batch(
+            tagger=model.tagger,
+            raw_texts=raw_texts,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+            mini_batch_size=mini_batch_size,
+        )
+
+
+def _get_entities_incremental_batch(
+    raw_texts: List[str],
+    previous_sentences: List[List[dict]],
+    aliases_to_anonymize: list,
+    mini_batch_size: int,
+    model_name: str,
+) -> list:
+    with _registry.use(model_name) as model:
+        return get_entities_incremental_batch(
+            tagger=model.tagger,
+            raw_texts=raw_texts,
+            previous_sentences=previous_sentences,
+            aliases_to_anonymize=aliases_to_anonymize,
+            sentence_cache=model.sentence_cache,
+            mini_batch_size=mini_batch_size,
+        )
+
+
+class WorkerPool:
+    """Pool of dedicated processes each holding its own model registry
+
+    Texts and entities are exchanged over IPC so that the forward pass never runs
+    in the process serving HTTP requests. Each worker is a single-process executor
+    so that the models can be loaded and listed in every worker.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        processes: int = 2,
+        num_threads: int = 1,
+        memory_budget: int = 0,
+    ):
+        """
+        Args:
+            model_name (str): name of the flair model loaded by each worker when
+                it starts, other models are loaded on demand
+            processes (int, optional): number of worker processes. Defaults to 2.
+            num_threads (int, optional): number of torch intra-op threads per
+                worker. Defaults to 1.
+            memory_budget (int, optional): memory budget of the models of the
+                whole pool, split evenly between the workers, see ModelRegistry.
+                Defaults to 0.
+        """
+        self.model_name = model_name
+        self.processes = processes
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                # forking a process in which torch already started threads may
+                # deadlock
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, num_threads, memory_budget // processes),
+            )
+            for _ in range(processes)
+        ]
+        # calls submitted to each worker and not finished yet
+        self._pending = [0] * processes
+        self._lock = threading.Lock()
+
+    def _release(self, index: int):
+        with self._lock:
+            self._pending[index] -= 1
+
+    def _submit(self, function, *args) -> Future:
+        """Submits a call to the worker with the fewest pending calls"""
+        with self._lock:
+            index = min(range(self.processes), key=self._pending.__getitem__)
+            self._pending[index] += 1
+        future = self._executors[index].submit(function, *args)
+        future.add_done_callback(lambda _: self._release(index))
+        return future
+
+    def _broadcast(self, function, *args) -> list:
+        """Runs a call in every worker and returns their results"""
+        futures = [executor.submit(function, *args) for executor in self._executors]
+        return [future.result() for future in futures]
+
+    def submit(
+        self, raw_text: str, aliases_to_anonymize: list, model_name: str = None
+    ) -> Future:
+        return self._submit(
+            _get_entities,
+            raw_text,
+            aliases_to_anonymize,
+            model_name or self.model_name,
+        )
+
+    def get_entities(
+        self, raw_text: str, aliases_to_anonymize: list, model_name: str = None
+    ) -> dict:
+        """Returns a dictionary of named entities computed by a worker process
+
+        Args:
+            raw_text (str): Sentence to alias
+            aliases_to_anonymize (list): List of aliases to keep.
+            model_name (str, optional): name of the model. Defaults to the model
+                loaded when the workers start.
+
+        Returns:
+            dict: dictionary with unique entities as keys and unique alias as values
+        """
+        return self.submit(raw_text, aliases_to_anonymize, model_name).result()
+
+    def get_entities_batch(
+        self,
+        raw_texts: List[str],
+        aliases_to_anonymize: list,
+        mini_batch_size: int = 32,
+        model_name: str = None,
+    ) -> List[dict]:
+        """Returns the named entities of several texts, tagged by a single worker
+
+        Args:
+            raw_texts (List[str]): texts to alias
+            aliases_to_anonymize (list): List of aliases to keep.
+            mini_batch_size (int, optional): number of sentences per forward
+                pass of the tagger. Defaults to 32.
+            model_name (str, optional): name of the model. Defaults to the model
+                loaded when the workers start.
+
+        Returns:
+            List[dict]: for each text, dictionary with unique entities as keys
+                and unique alias as values
+        """
+        return self._submit(
+            _get_entities_batch,
+            raw_texts,
+            aliases_to_anonymize,
+            mini_batch_size,
+            model_name or self.model_name,
+        ).result()
+
+    def get_entities_incremental_batch(
+        self,
+        raw_texts: List[str],
+        previous_sentences: List[List[dict]],
+        aliases_to_anonymize: list,
+        mini_batch_size: int = 32,
+        model_name: str = None,
+    ) -> List[Tuple[dict, List[dict]]]:
+        """Returns the named entities of edited texts and of their sentences,
+        tagged by a single worker, see
+        aliasing_model.get_entities_incremental_batch"""
+        return self._submit(
+            _get_entities_incremental_batch,
+            raw_texts,
+            previous_sentences,
+            aliases_to_anonymize,
+            mini_batch_size,
+            model_name or self.model_name,
+        ).result()
+
+    def load_model(self, model_name: str = None) -> dict:
+        """Loads a model in every worker
+
+        Returns:
+            dict: description of the model, see loading.load_tagger
+        """
+        return self._broadcast(_load_model, model_name or self.model_name)[0]
+
+    def get_models(self) -> List[dict]:
+        """Returns the description of the models loaded by each worker, with the
+        index of the worker"""
+        return [
+            {**description, "worker": index}
+            for index, descriptions in enumerate(self._broadcast(_get_models))
+            for description in descriptions
+        ]
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False)
@@ -6,6 +6,11 @@ cp requirements.txt ./api_docker/src/requirements.txt
 
 cp -r api api_docker/src
 
+# calibration texts of the quantized model, see QUANTIZATION_CALIBRATION_FILE
+mkdir ./api_docker/src/data
+
+cp data/records.json api_docker/src/data/records.json
+
 docker image build api_docker/. -t pauldechorgnat/cdc_demo_api
 
 rm -r ./api_docker/src
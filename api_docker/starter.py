@@ -1,3 +1,16 @@
+import os
+
 import nltk
+from flair.models import SequenceTagger
+
+from api.artifacts import save_model_artifact
+from api.config import MODEL_ALLOWED_NAMES
+from api.config import MODEL_ARTIFACT_DIR
 
 nltk.download("punkt")
+
+# the API memory-maps these artifacts instead of downloading the models at startup
+for model_name in MODEL_ALLOWED_NAMES:
+    save_model_artifact(
+        SequenceTagger.load(model_name), os.path.join(MODEL_ARTIFACT_DIR, model_name)
+    )
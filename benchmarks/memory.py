@@ -0,0 +1,46 @@
+"""Reports the unique (USS) and proportional (PSS) memory of the API workers
+
+Start the API with several gunicorn workers, send it a few requests so that every
+worker has served a prediction, then give the pid of the gunicorn master:
+
+    INFERENCE_MODE=preload gunicorn api.main:api --preload --workers 4 \\
+        --worker-class uvicorn.workers.UvicornWorker
+    python -m benchmarks.memory <master pid>
+
+Compared with INFERENCE_MODE=local (each worker loads its own model), the USS of
+the workers should drop by about the size of the model. USS and PSS are only
+available on Linux.
+"""
+import sys
+
+import psutil
+
+
+def get_memory(process: psutil.Process) -> dict:
+    memory = process.memory_full_info()
+    return {
+        "RSS (MB)": memory.rss / 1024**2,
+        "USS (MB)": memory.uss / 1024**2,
+        "PSS (MB)": memory.pss / 1024**2,
+        "shared (MB)": (memory.rss - memory.uss) / 1024**2,
+    }
+
+
+if __name__ == "__main__":
+    master = psutil.Process(int(sys.argv[1]))
+    processes = [master] + master.children(recursive=True)
+
+    results = {
+        f"{p.pid} ({'master' if p is master else 'worker'})": get_memory(p)
+        for p in processes
+    }
+    metrics = list(next(iter(results.values())))
+
+    print(f"{'':24}" + "".join(f"{metric:>14}" for metric in metrics))
+    for name, memory in results.items():
+        print(f"{name:24}" + "".join(f"{memory[m]:14.1f}" for m in metrics))
+
+    # the PSS of all processes adds up to the memory they actually use
+    total_pss = sum(memory["PSS (MB)"] for memory in results.values())
+    total_uss = sum(memory["USS (MB)"] for memory in results.values())
+    print(f"\nTotal PSS: {total_pss:.1f} MB, total USS: {total_uss:.1f} MB")
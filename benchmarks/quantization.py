@@ -0,0 +1,84 @@
+"""Compares the float32 and int8 dynamically quantized NER models on CPU
+
+Reports latency, throughput, memory and agreement of the entities found by both
+models on data/records.json and the test fixtures. Run from the repository root:
+
+    python -m benchmarks.quantization
+"""
+import io
+import os
+import statistics
+import sys
+import time
+
+import psutil
+import torch
+from flair.models import SequenceTagger
+
+from api.aliasing_model import get_entities
+from api.config import MODEL_NAME
+from api.config import QUANTIZATION_MIN_AGREEMENT
+from api.quantization import entity_agreement
+from api.quantization import load_calibration_texts
+from api.quantization import quantize_tagger
+
+sys.path.insert(0, "tests")
+
+import config  # noqa: E402
+
+
+def get_model_size(tagger) -> int:
+    buffer = io.BytesIO()
+    torch.save(tagger.state_dict(), buffer)
+    return buffer.tell()
+
+
+def get_rss() -> int:
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def benchmark(tagger, texts: list) -> dict:
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        get_entities(tagger=tagger, raw_text=text)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "mean latency (ms)": 1000 * statistics.mean(latencies),
+        "p95 latency (ms)": 1000 * sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+        "throughput (texts/s)": len(latencies) / sum(latencies),
+        "model size (MB)": get_model_size(tagger) / 1024**2,
+    }
+
+
+if __name__ == "__main__":
+    texts = load_calibration_texts("data/records.json") + [config.TEXT]
+
+    rss = get_rss()
+    float_tagger = SequenceTagger.load(MODEL_NAME)
+    float_tagger.eval()
+    float_rss = get_rss() - rss
+
+    rss = get_rss()
+    int8_tagger = quantize_tagger(float_tagger)
+    int8_rss = get_rss() - rss
+
+    results = {
+        "float32": {
+            **benchmark(float_tagger, texts),
+            "RSS (MB)": float_rss / 1024**2,
+        },
+        "int8": {**benchmark(int8_tagger, texts), "RSS (MB)": int8_rss / 1024**2},
+    }
+
+    print(f"{'':24}{'float32':>12}{'int8':>12}")
+    for metric in results["float32"]:
+        print(
+            f"{metric:24}"
+            f"{results['float32'][metric]:12.2f}"
+            f"{results['int8'][metric]:12.2f}"
+        )
+
+    agreement = entity_agreement(float_tagger, int8_tagger, texts)
+    print(f"\nEntity agreement: {agreement:.3f} (minimum {QUANTIZATION_MIN_AGREEMENT})")
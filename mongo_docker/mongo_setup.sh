@@ -1,5 +1,10 @@
 # !/usr/bin/sh
 
-docker container run --name my_mongo --rm -v `pwd`/mongo_docker/data:/data/db -p 27017:27017 mongo:latest
+# change streams (used by the CDC worker, see api/cdc.py) require a replica set
+docker container run --name my_mongo --rm -d -v `pwd`/mongo_docker/data:/data/db -p 27017:27017 mongo:latest --replSet rs0 --bind_ip_all
+
+sleep 5
+
+docker container exec my_mongo mongosh --quiet --eval "try { rs.status() } catch (e) { rs.initiate({_id: 'rs0', members: [{_id: 0, host: 'localhost:27017'}]}) }"
 
 docker container exec -it my_mongo mongosh
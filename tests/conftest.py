@@ -1,4 +1,5 @@
 import datetime
+import threading
 
 import config
 import pytest
@@ -11,6 +12,58 @@ from api.config import ADMIN_USER_COLLECTION
 from api.config import ARTICLE_DB
 
 
+class FakeTensor:
+    def __init__(self, size: int = 1024):
+        self.size = size
+
+    def numel(self):
+        return self.size
+
+    def element_size(self):
+        return 1
+
+
+class FakeTagger:
+    """Tagger of the given size, in bytes, recording the batches it predicts.
+    Its predictions wait for the release event."""
+
+    def __init__(self, name: str = "ner", size: int = 1024, embeddings: list = ()):
+        self.name = name
+        self.size = size
+        self.embeddings = embeddings
+        self.closed = False
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def parameters(self):
+        return [FakeTensor(self.size)]
+
+    def buffers(self):
+        return []
+
+    def named_modules(self):
+        yield "", self
+        for index, embeddings in enumerate(self.embeddings):
+            yield f"embeddings.list_embedding_{index}", embeddings
+
+    def predict(self, sentences, mini_batch_size=None):
+        self.started.set()
+        self.release.wait()
+        self.batches.append(list(sentences))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(scope="session")
+def ner_tagger():
+    """The flair "ner" tagger, the tests using it are skipped without flair"""
+    models = pytest.importorskip("flair.models")
+    return models.SequenceTagger.load("ner")
+
+
 @pytest.fixture
 def fake_article_data():
     data = {
@@ -1,8 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 from flair.models import SequenceTagger
 
 from api.aliasing_model import anonymize_text
 from api.aliasing_model import get_entities
+from api.aliasing_model import get_entities_batch
+from api.aliasing_model import get_entities_incremental
+from api.aliasing_model import get_entities_incremental_batch
 from api.aliasing_model import replace_text
+from api.aliasing_model import segment_text
+from api.batching import BatchingTagger
+from api.cache import ResultCache
 
 
 tagger = SequenceTagger.load("ner")
@@ -21,13 +30,160 @@ def test_get_entities():
     assert entities == entities1
 
 
+def test_segment_text():
+    chunks = segment_text("Meta is in Ukraine.In a post, Nick Clegg said so.")
+
+    assert chunks == ["Meta is in Ukraine.", "In a post, Nick Clegg said so."]
+
+    long_text = " ".join(f"word{i}" for i in range(300))
+    chunks = segment_text(long_text, max_tokens=128, overlap=16)
+
+    assert [len(c.split()) for c in chunks] == [128, 128, 76]
+    assert chunks[1].split()[0] == "word112"
+
+
+@pytest.mark.parametrize(
+    "length, max_tokens, overlap",
+    [(129, 128, 16), (240, 128, 16), (241, 128, 16), (300, 10, 9), (25, 10, 0)],
+)
+def test_segment_text_tail(length, max_tokens, overlap):
+    tokens = [f"word{i}" for i in range(length)]
+
+    chunks = segment_text(" ".join(tokens), max_tokens=max_tokens, overlap=overlap)
+
+    # every token is in a window, the last one ending with the sentence
+    assert chunks[-1].split()[-1] == tokens[-1]
+    assert {t for c in chunks for t in c.split()} == set(tokens)
+    assert all(len(c.split()) <= max_tokens for c in chunks)
+
+
+@pytest.mark.parametrize("overlap", [128, 200, -1])
+def test_segment_text_invalid_overlap(overlap):
+    with pytest.raises(ValueError):
+        segment_text("Donald Trump left.", max_tokens=128, overlap=overlap)
+
+
 def test_replace_text():
     new_text = replace_text(raw_text=text1, entities=entities1)
 
     assert new_text == clean_text1
 
 
+def test_replace_text_nested_entities():
+    text = "Donald Trump met Trump at UNESCO and the UN."
+    entities = {"Trump": "PER_1", "Donald Trump": "PER_0", "UN": "ORG_0"}
+
+    new_text = replace_text(raw_text=text, entities=entities)
+
+    assert new_text == "PER_0 met PER_1 at UNESCO and the ORG_0."
+
+
 def test_anonymized_text():
     new_text = anonymize_text(tagger=tagger, raw_text=text1)
 
     assert new_text == clean_text1
+
+
+def test_batching_tagger():
+    batching_tagger = BatchingTagger(tagger, max_batch_size=8, max_wait=0.05)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(
+            executor.map(
+                lambda t: get_entities(tagger=batching_tagger, raw_text=t),
+                [text1] * 10,
+            )
+        )
+
+    for entities in results:
+        assert entities == entities1
+
+
+class CountingTagger:
+    def __init__(self, tagger):
+        self.tagger = tagger
+        self.tagged_sentences = 0
+        self.calls = []
+
+    def predict(self, sentences, **kwargs):
+        self.tagged_sentences += len(sentences)
+        self.calls.append(kwargs)
+        self.tagger.predict(sentences, **kwargs)
+
+
+def test_sentence_deduplication():
+    counting_tagger = CountingTagger(tagger)
+    sentence_cache = ResultCache(name="sentences")
+
+    entities = get_entities(
+        tagger=counting_tagger,
+        raw_text=f"{text1} {text1}",
+        sentence_cache=sentence_cache,
+    )
+
+    assert entities == entities1
+    assert counting_tagger.tagged_sentences == 1
+
+    entities = get_entities(
+        tagger=counting_tagger, raw_text=text1, sentence_cache=sentence_cache
+    )
+
+    assert entities == entities1
+    assert counting_tagger.tagged_sentences == 1
+
+
+def test_get_entities_batch():
+    counting_tagger = CountingTagger(tagger)
+
+    entities_list = get_entities_batch(
+        tagger=counting_tagger,
+        raw_texts=[text1, "Donald Trump left.", text1],
+        mini_batch_size=4,
+    )
+
+    assert entities_list[0] == entities1
+    assert entities_list[1] == {"Donald Trump": "PER_0"}
+    assert entities_list[2] == entities1
+    assert counting_tagger.calls == [{"mini_batch_size": 4}]
+
+
+def test_get_entities_incremental():
+    counting_tagger = CountingTagger(tagger)
+
+    entities, sentences = get_entities_incremental(
+        tagger=counting_tagger, raw_text=text1, previous_sentences=[]
+    )
+
+    assert entities == entities1
+    assert counting_tagger.tagged_sentences == 1
+
+    new_text = f"Joe Biden visited Paris. {text1}"
+    entities, sentences = get_entities_incremental(
+        tagger=counting_tagger, raw_text=new_text, previous_sentences=sentences
+    )
+
+    assert entities == get_entities(tagger=tagger, raw_text=new_text)
+    assert entities["Donald Trump"] == "PER_1"
+    assert len(sentences) == 2
+    assert counting_tagger.tagged_sentences == 2
+
+
+def test_get_entities_incremental_batch():
+    counting_tagger = CountingTagger(tagger)
+    _, sentences = get_entities_incremental(
+        tagger=tagger, raw_text=text1, previous_sentences=[]
+    )
+    new_text = f"Joe Biden visited Paris. {text1}"
+
+    results = get_entities_incremental_batch(
+        tagger=counting_tagger,
+        raw_texts=[new_text, text1],
+        previous_sentences=[sentences, []],
+    )
+
+    assert results[0] == get_entities_incremental(
+        tagger=tagger, raw_text=new_text, previous_sentences=[]
+    )
+    assert results[1] == (entities1, sentences)
+    # only the new sentence is tagged, the other one is known
+    assert counting_tagger.tagged_sentences == 1
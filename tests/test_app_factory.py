@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from api.main import create_data_app
+from api.main import create_model_app
+
+
+def test_data_app_does_not_import_flair():
+    code = (
+        "import sys\n"
+        "from api.main import create_data_app\n"
+        "create_data_app()\n"
+        "assert 'flair' not in sys.modules\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_app_routes():
+    data_paths = {r.path for r in create_data_app().routes}
+    model_paths = {r.path for r in create_model_app().routes}
+
+    assert "/data/articles" in data_paths
+    assert "/users/signin" in data_paths
+    assert "/model/anonymize" not in data_paths
+
+    assert "/model/anonymize" in model_paths
+    assert "/ready" in model_paths
+    assert "/data/articles" not in model_paths
@@ -0,0 +1,25 @@
+import pytest
+
+from api.aliasing_model import get_entities
+from api.artifacts import load_model_artifact
+from api.artifacts import named_word_vectors
+from api.artifacts import save_model_artifact
+
+text1 = "The UN is said to meet in New-York according to Donald Trump."
+
+entities1 = {"UN": "ORG_0", "New-York": "LOC_0", "Donald Trump": "PER_0"}
+
+
+def test_model_artifact(tmp_path, ner_tagger):
+    with pytest.raises(FileNotFoundError):
+        load_model_artifact(str(tmp_path))
+
+    save_model_artifact(ner_tagger, str(tmp_path))
+    mapped_tagger = load_model_artifact(str(tmp_path))
+    word_vectors = [array for _, _, array in named_word_vectors(mapped_tagger)]
+
+    # the glove vectors are mapped from the weights file, not pickled
+    assert word_vectors and not any(array.flags.writeable for array in word_vectors)
+
+    assert get_entities(tagger=mapped_tagger, raw_text=text1) == entities1
+    assert get_entities(tagger=ner_tagger, raw_text=text1) == entities1
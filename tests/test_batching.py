@@ -0,0 +1,69 @@
+import threading
+import time
+
+from conftest import FakeTagger
+
+from api.batching import BatchingTagger
+from api.scheduler import use_lane
+
+
+def _wait_for_depth(tagger, lane, depth):
+    while tagger._queue.depth(lane) < depth:
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_a_batch():
+    fake_tagger = FakeTagger()
+    tagger = BatchingTagger(fake_tagger, max_batch_size=64, max_wait=0.5)
+    sentences = [f"Sentence {i}" for i in range(16)]
+
+    threads = [
+        threading.Thread(target=tagger.predict, args=(sentence,))
+        for sentence in sentences
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tagger.close()
+
+    # the interactive calls are not gated before the batcher
+    assert len(fake_tagger.batches) == 1
+    assert sorted(fake_tagger.batches[0]) == sorted(sentences)
+
+
+def test_batch_order():
+    fake_tagger = FakeTagger()
+    fake_tagger.release.clear()
+    tagger = BatchingTagger(fake_tagger, max_batch_size=1, max_wait=0)
+
+    def predict(sentence, lane):
+        with use_lane(lane):
+            tagger.predict(sentence)
+
+    threads = [threading.Thread(target=predict, args=("first", "interactive"))]
+    threads[0].start()
+    # the first call is being tagged, the others wait in the queue
+    fake_tagger.started.wait()
+    for count, (sentence, lane) in enumerate(
+        [
+            ("a long article", "bulk"),
+            ("a long interactive text", "interactive"),
+            ("short", "interactive"),
+        ],
+        1,
+    ):
+        threads.append(threading.Thread(target=predict, args=(sentence, lane)))
+        threads[-1].start()
+        _wait_for_depth(tagger, lane, 2 if count == 3 else 1)
+    fake_tagger.release.set()
+    for thread in threads:
+        thread.join()
+    tagger.close()
+
+    assert fake_tagger.batches == [
+        ["first"],
+        ["short"],
+        ["a long interactive text"],
+        ["a long article"],
+    ]
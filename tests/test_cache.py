@@ -0,0 +1,59 @@
+import time
+
+from api.cache import make_cache_key
+from api.cache import ResultCache
+
+
+def test_make_cache_key():
+    key = make_cache_key("some text", ["PER", "LOC"], "ner")
+
+    assert key == make_cache_key("some text", ["LOC", "PER"], "ner")
+    assert key != make_cache_key("some text", ["PER"], "ner")
+    assert key != make_cache_key("some text", ["PER", "LOC"], "ner-fast")
+
+
+def test_cache_lru_eviction():
+    cache = ResultCache(max_entries=2)
+
+    cache.set("a", {"UN": "ORG_0"})
+    cache.set("b", {"UN": "ORG_0"})
+    cache.get("a")
+    cache.set("c", {"UN": "ORG_0"})
+
+    assert cache.get("a") == {"UN": "ORG_0"}
+    assert cache.get("b") is None
+    assert cache.get("c") == {"UN": "ORG_0"}
+
+
+def test_cache_ttl():
+    cache = ResultCache(ttl=0.01)
+
+    cache.set("a", {"UN": "ORG_0"})
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_cache_max_bytes():
+    cache = ResultCache(max_bytes=100)
+
+    cache.set("a", {"Donald Trump": "PER_0"})
+    cache.set("b", {"x" * 200: "PER_0"})
+    cache.set("c", {"New-York": "LOC_0" * 14})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_cache_get_or_compute():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"UN": "ORG_0"}
+
+    assert cache.get_or_compute("a", compute) == {"UN": "ORG_0"}
+    assert cache.get_or_compute("a", compute) == {"UN": "ORG_0"}
+    assert len(calls) == 1
@@ -0,0 +1,47 @@
+from api import cdc
+
+
+class FakeStream:
+    """Change stream returning no change, its resume token advancing anyway"""
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+        self.resume_token = None
+
+    @property
+    def alive(self):
+        return self.rounds > 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def watch(self, **kwargs):
+        return self.stream
+
+
+def test_resume_token_saved_while_idle(monkeypatch):
+    stream = FakeStream(rounds=3)
+    saved_tokens = []
+
+    def collect_changes(stream):
+        stream.rounds -= 1
+        stream.resume_token = {"_data": str(stream.rounds)}
+        return []
+
+    monkeypatch.setattr(cdc, "article_db", FakeDatabase(stream))
+    monkeypatch.setattr(cdc, "load_resume_token", lambda: None)
+    monkeypatch.setattr(cdc, "save_resume_token", saved_tokens.append)
+    monkeypatch.setattr(cdc, "collect_changes", collect_changes)
+    monkeypatch.setattr(cdc, "CDC_CHECKPOINT_INTERVAL", 0)
+
+    cdc.run()
+
+    assert saved_tokens == [{"_data": "2"}, {"_data": "1"}, {"_data": "0"}]
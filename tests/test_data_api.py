@@ -1,3 +1,7 @@
+import datetime
+import json
+import time
+
 import config
 import requests
 
@@ -49,6 +53,141 @@ def test_get_articles_section(article, user):
         assert i["section"] == "fake_section"
 
 
+def test_get_articles_pagination(article, user):
+    my_user = user(roles=["admin"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+
+    date = datetime.datetime(2030, 1, 1)
+    articles = [
+        article(section="fake_pagination", source=source, date_published=date)
+        for source in ["sport", "health", "sport"]
+    ] + [
+        article(
+            section="fake_pagination", date_published=date - datetime.timedelta(days=1)
+        )
+    ]
+
+    pages = []
+    params = {"sections": ["fake_pagination"], "limit": 2}
+    while True:
+        response = requests.get(
+            url=f"{config.API_URL}/data/articles", params=params, headers=HEADERS
+        )
+        assert response.status_code == 200, response.content
+        pages.append([i["object_id"] for i in response.json()])
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert [len(page) for page in pages] == [2, 2]
+    object_ids = [object_id for page in pages for object_id in page]
+    # most recently published first, then by decreasing id
+    assert object_ids == sorted(
+        [a["object_id"] for a in articles[:3]], reverse=True
+    ) + [articles[3]["object_id"]]
+
+
+def test_get_articles_wrong_cursor(user):
+    my_user = user(roles=["admin"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"cursor": "not a cursor"},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 422, response.content
+
+
+def test_get_articles_sort(article, user):
+    my_user = user(roles=["admin"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+
+    for headline in ["b", "c", "a"]:
+        article(section="fake_sort", headline=headline)
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"sections": ["fake_sort"], "sort": "headline", "fields": "headline"},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+    assert [i["headline"] for i in response.json()] == ["a", "b", "c"]
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"sort": "raw_text"},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 422, response.content
+
+
+def test_get_articles_stream(article, user):
+    my_user = user(roles=["admin"])
+    HEADERS = {
+        "Authorization": f"Bearer {my_user['access_token']}",
+        "Accept": "application/x-ndjson",
+    }
+
+    articles = [article(section="fake_stream") for _ in range(3)]
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"sections": ["fake_stream"]},
+        headers=HEADERS,
+        stream=True,
+    )
+
+    assert response.status_code == 200, response.content
+    assert response.headers["content-type"] == "application/x-ndjson"
+    data = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert sorted(i["object_id"] for i in data) == sorted(
+        a["object_id"] for a in articles
+    )
+    for i in data:
+        assert i["section"] == "fake_stream"
+
+
+def test_get_articles_fields(article, user):
+    my_user = user(roles=["admin"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+
+    my_article = article(section="fake_fields")
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"sections": ["fake_fields"], "fields": "headline,section"},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+    assert response.json() == [{"headline": "fake headline", "section": "fake_fields"}]
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles/sport/{my_article['object_id']}",
+        params={"fields": ["object_id", "headline"]},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+    assert response.json() == {
+        "object_id": my_article["object_id"],
+        "headline": "fake headline",
+    }
+
+    response = requests.get(
+        url=f"{config.API_URL}/data/articles",
+        params={"fields": "password"},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 422, response.content
+
+
 def test_update_article(article, user):
     my_user = user(roles=["admin"])
     HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
@@ -102,6 +241,7 @@ def test_auto_anonymize(article, user):
 
     assert auto_anonymized_text == config.ANONYMIZED_TEXT
     assert len(new_events) == len(old_events) + 1
+    assert new_events[-1]["model"] == "ner"
 
     assert auto_anonymized_aliases == config.FORMATTED_ALIASES
 
@@ -173,3 +313,98 @@ def test_public_user_masks(user, article):
     data = response.json()
 
     assert data["raw_text"] == my_article["raw_text"], my_other_user
+
+
+def test_auto_anonymization_job(article, user):
+    my_user = user(roles=["contributor"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+    section = config.generate_fake_username()
+
+    articles = [article(section=section) for _ in range(3)]
+
+    response = requests.post(
+        url=f"{config.API_URL}/data/articles/auto-jobs",
+        json={"category": ["sport"], "sections": [section]},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+
+    job_id = response.json()["job_id"]
+
+    for _ in range(60):
+        response = requests.get(
+            url=f"{config.API_URL}/data/articles/auto-jobs/{job_id}",
+            headers=HEADERS,
+        )
+        assert response.status_code == 200, response.content
+        data = response.json()
+        if data["status"] not in ["pending", "running"]:
+            break
+        time.sleep(1)
+
+    assert data["status"] == "completed", data
+    assert data["total"] == data["processed"] == len(articles)
+
+    for my_article in articles:
+        response = requests.get(
+            url=f"{config.API_URL}/data/articles/sport/{my_article['object_id']}",
+            headers=HEADERS,
+        )
+        assert response.json()["auto_anonymized_text"] == config.ANONYMIZED_TEXT
+
+
+def test_update_article_raw_text(article, user):
+    my_user = user(roles=["admin"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+    category = "sport"
+    my_article = article()
+
+    object_id = my_article["object_id"]
+
+    response = requests.put(
+        url=f"{config.API_URL}/data/articles/{category}/{object_id}/auto",
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+
+    response = requests.put(
+        url=f"{config.API_URL}/data/articles/{category}/{object_id}",
+        json={"raw_text": f"{config.TEXT} Donald Trump left."},
+        headers=HEADERS,
+    )
+
+    assert response.status_code == 200, response.content
+
+    data = response.json()
+
+    assert data["auto_anonymized_text"] == f"{config.ANONYMIZED_TEXT} PER_0 left."
+    assert data["events"][-1]["type"] == "auto_anonymization"
+    assert data["events"][-1]["mode"] == "incremental"
+    assert data["events"][-2]["type"] == "modification"
+
+
+def test_auto_anonymize_unchanged(article, user):
+    my_user = user(roles=["contributor"])
+    HEADERS = {"Authorization": f"Bearer {my_user['access_token']}"}
+    category = "sport"
+    my_article = article()
+
+    object_id = my_article["object_id"]
+    url = f"{config.API_URL}/data/articles/{category}/{object_id}/auto"
+
+    response = requests.put(url=url, headers=HEADERS)
+
+    assert response.status_code == 200, response.content
+
+    events = response.json()["events"]
+
+    response = requests.put(url=url, headers=HEADERS)
+
+    assert response.status_code == 200, response.content
+
+    data = response.json()
+
+    assert data["events"] == events
+    assert data["auto_anonymized_text"] == config.ANONYMIZED_TEXT
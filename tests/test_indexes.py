@@ -0,0 +1,127 @@
+import datetime
+
+import bson
+import pytest
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from api import indexes
+from api.indexes import apply_indexes
+from api.indexes import ARTICLE_INDEXES
+from api.indexes import check_query_plan
+from api.indexes import get_plan_stages
+from api.pagination import parse_sort
+from api.utils import build_article_filter
+
+COLLSCAN_PLAN = {
+    "stage": "SORT",
+    "inputStage": {"stage": "COLLSCAN", "filter": {"username": {"$eq": "paul"}}},
+}
+IXSCAN_PLAN = {
+    "queryPlan": {
+        "stage": "FETCH",
+        "inputStage": {"stage": "IXSCAN", "indexName": "username_1"},
+    }
+}
+
+
+class FakeCollection:
+    def __init__(self, full_name="admin.users", plan=COLLSCAN_PLAN, duplicated=False):
+        self.full_name = full_name
+        self.plan = plan
+        self.duplicated = duplicated
+        self.explained = 0
+        self.indexes = []
+
+    def find(self, filter, sort):
+        return self
+
+    def explain(self):
+        self.explained += 1
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+    def create_indexes(self, models):
+        if self.duplicated and models[0].document.get("unique"):
+            raise OperationFailure("E11000 duplicate key error")
+        self.indexes.extend(models)
+        return [models[0].document["name"]]
+
+
+def test_get_plan_stages():
+    assert list(get_plan_stages(COLLSCAN_PLAN)) == ["SORT", "COLLSCAN"]
+    assert list(get_plan_stages(IXSCAN_PLAN)) == ["FETCH", "IXSCAN"]
+
+
+def test_check_query_plan(monkeypatch, caplog):
+    monkeypatch.setattr(indexes, "QUERY_PLAN_CHECK", "fail")
+    monkeypatch.setattr(indexes, "_checked_queries", set())
+    collection = FakeCollection()
+
+    with pytest.raises(RuntimeError):
+        check_query_plan(collection, {"username": "paul"})
+    with pytest.raises(RuntimeError):
+        check_query_plan(collection, {"username": "marie"})
+
+    monkeypatch.setattr(indexes, "QUERY_PLAN_CHECK", "log")
+    check_query_plan(collection, {"username": "paul"})
+    # each shape of query is explained once
+    check_query_plan(collection, {"username": "marie"})
+
+    assert collection.explained == 3
+    assert "scans the whole collection" in caplog.text
+
+    collection = FakeCollection(plan=IXSCAN_PLAN)
+    check_query_plan(collection, {"username": "paul", "roles": "admin"})
+
+    assert collection.explained == 1
+
+
+def test_apply_indexes():
+    users = FakeCollection(duplicated=True)
+    roles = FakeCollection(full_name="admin.roles")
+    client = {"admin": {"users": users, "roles": roles}}
+    spec = {
+        "admin": {
+            "users": [IndexModel([("username", 1)], unique=True)],
+            "roles": [IndexModel([("role", 1)])],
+        }
+    }
+
+    names = apply_indexes(client, spec)
+
+    # the unique index cannot be created on duplicated usernames
+    assert names == ["admin.roles.role_1"]
+    assert len(roles.indexes) == 1
+
+
+DATE = datetime.datetime(2022, 3, 14)
+
+
+@pytest.mark.parametrize(
+    "mongo_filter, sort",
+    [
+        # GET /data/articles
+        ({}, parse_sort("-date_published")),
+        ({}, parse_sort("headline")),
+        (build_article_filter(sections=["sport"]), parse_sort("-date_published")),
+        (build_article_filter(date_start=DATE, date_end=DATE), None),
+        # stale articles of GET /data/articles?stale=true and of the jobs
+        (build_article_filter(stale_only=True), None),
+        # chunks of the jobs
+        (
+            {**build_article_filter(stale_only=True), "_id": {"$gt": bson.ObjectId()}},
+            [("_id", 1)],
+        ),
+        # /auto and the edits of an article
+        ({"_id": bson.ObjectId()}, None),
+    ],
+)
+def test_article_queries_use_an_index(mongo_filter, sort):
+    # the leading field of an index, or _id, must be filtered or sorted on for
+    # the query not to scan the whole collection
+    leading_fields = {"_id"} | {
+        next(iter(index.document["key"])) for index in ARTICLE_INDEXES
+    }
+    fields = set(mongo_filter) | {field for field, _ in sort or []}
+
+    assert fields & leading_fields
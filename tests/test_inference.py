@@ -0,0 +1,22 @@
+from conftest import FakeTagger
+
+from api import inference
+
+
+def test_preload_models(monkeypatch):
+    sizes = {"ner": 1024, "ner-fast": 512, "ner-large": 4096, "ner-small": 256}
+    frozen = []
+    monkeypatch.setattr(inference, "_preloaded_models", {})
+    monkeypatch.setattr(inference, "MODEL_INTERACTIVE_NAME", "ner-fast")
+    monkeypatch.setattr(
+        inference,
+        "load_tagger",
+        lambda name: (FakeTagger(name, sizes[name]), {"model": name}),
+    )
+    monkeypatch.setattr(inference, "freeze_tagger", lambda t: frozen.append(t.name))
+
+    names = inference.preload_models(list(sizes), memory_budget=2048)
+
+    # the interactive model first, then the models that fit in the budget
+    assert names == ["ner-fast", "ner", "ner-small"]
+    assert frozen == names
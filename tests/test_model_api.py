@@ -1,3 +1,6 @@
+import json
+import time
+
 import config
 import requests
 
@@ -78,3 +81,107 @@ def test_post_anonymize_text():
         {"text": k, "alias": v, "alias_type": v.split("_")[0]}
         for k, v in config.ALIASES.items()
     ]
+
+
+def test_post_anonymize_text_too_long():
+    response = requests.post(
+        url=f"{config.API_URL}/model/anonymize", json={"text": "a " * 100_000}
+    )
+
+    assert response.status_code == 422, response.content
+
+
+def test_get_ready():
+    for _ in range(60):
+        response = requests.get(url=f"{config.API_URL}/ready")
+        if response.status_code != 503:
+            break
+        time.sleep(1)
+
+    assert response.status_code == 200, response.content
+
+    data = response.json()
+
+    assert data["ready"]
+
+
+def test_post_anonymize_text_stream():
+    lines = [json.dumps({"text": config.TEXT})] * 5 + ["not json"]
+    response = requests.post(
+        url=f"{config.API_URL}/model/anonymize/stream",
+        data="\n".join(lines).encode(),
+        stream=True,
+    )
+
+    assert response.status_code == 200, response.content
+
+    data = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert len(data) == 6
+
+    for result in data[:5]:
+        assert result["anonymized_text"] == config.ANONYMIZED_TEXT
+
+    assert data[5]["line"] == 5
+    assert "error" in data[5]
+
+
+def test_post_get_aliases_batch():
+    response = requests.post(
+        url=f"{config.API_URL}/model/aliases/batch",
+        json={"texts": [config.TEXT, "Donald Trump left."]},
+    )
+
+    assert response.status_code == 200, response.content
+
+    data = response.json()
+
+    assert len(data) == 2
+    assert {i["text"]: i["alias"] for i in data[0]} == config.ALIASES
+    assert {i["text"]: i["alias"] for i in data[1]} == {"Donald Trump": "PER_0"}
+
+
+def test_post_anonymize_text_batch():
+    response = requests.post(
+        url=f"{config.API_URL}/model/anonymize/batch",
+        json={"texts": [config.TEXT, "Donald Trump left.", config.TEXT]},
+    )
+
+    assert response.status_code == 200, response.content
+
+    data = response.json()
+
+    assert [i["anonymized_text"] for i in data] == [
+        config.ANONYMIZED_TEXT,
+        "PER_0 left.",
+        config.ANONYMIZED_TEXT,
+    ]
+
+
+def test_post_anonymize_text_model():
+    response = requests.post(
+        url=f"{config.API_URL}/model/anonymize",
+        params={"model": "ner"},
+        json={"text": config.TEXT},
+    )
+
+    assert response.status_code == 200, response.content
+
+    assert response.json()["anonymized_text"] == config.ANONYMIZED_TEXT
+
+    response = requests.get(url=f"{config.API_URL}/models")
+
+    assert response.status_code == 200, response.content
+
+    for model in response.json():
+        assert model["size"] > 0
+
+
+def test_post_anonymize_text_wrong_model():
+    response = requests.post(
+        url=f"{config.API_URL}/model/anonymize",
+        params={"model": "WRONG_MODEL"},
+        json={"text": config.TEXT},
+    )
+
+    assert response.status_code == 422, response.content
@@ -0,0 +1,13 @@
+import pytest
+from pydantic import ValidationError
+
+from api import models
+from api.models import TextBatch
+
+
+def test_text_batch_total_length(monkeypatch):
+    monkeypatch.setattr(models, "MODEL_BATCH_MAX_TEXT_LENGTH", 10)
+
+    assert TextBatch(texts=["12345", "67890"]).texts == ["12345", "67890"]
+    with pytest.raises(ValidationError, match="11 characters"):
+        TextBatch(texts=["12345", "678901"])
@@ -0,0 +1,102 @@
+import io
+import json
+
+import pytest
+from conftest import FakeTagger
+
+from api import offline
+from api.offline import anonymize_file
+from api.offline import anonymize_records
+from api.offline import count_lines
+from api.offline import read_records
+from api.registry import LoadedModel
+
+
+def test_read_records(monkeypatch):
+    # records spread over several reads
+    monkeypatch.setattr(offline, "READ_SIZE", 7)
+
+    with open("data/records.json", "r", encoding="utf-8") as file:
+        records = json.load(file)
+    with open("data/records.json", "r", encoding="utf-8") as file:
+        assert list(read_records(file)) == records
+
+    lines = '{"a": 1}\n\n{"a": [2, 3]}\n{"b": "x"}'
+    assert list(read_records(io.StringIO(lines))) == [
+        {"a": 1},
+        {"a": [2, 3]},
+        {"b": "x"},
+    ]
+    assert list(read_records(io.StringIO(" [ ]"))) == []
+
+
+def test_count_lines(tmp_path):
+    path = tmp_path / "anonymized.jsonl"
+    path.write_text('{"a": 1}\n{"a": 2}\n{"a"')
+
+    assert count_lines(str(path)) == 2
+    assert path.read_text() == '{"a": 1}\n{"a": 2}\n'
+
+
+def test_anonymize_records(monkeypatch):
+    text = "Donald Trump left."
+    monkeypatch.setattr(offline, "_model", LoadedModel("ner", FakeTagger(), {}))
+    monkeypatch.setattr(offline, "segment_text", lambda raw_text: [raw_text])
+    monkeypatch.setattr(
+        offline,
+        "tag_sentences",
+        lambda tagger, sentences, **kwargs: [{"Donald Trump": "PER"}] * len(sentences),
+    )
+    events = [{"type": "insertion", "author": "test"}]
+
+    [record, empty] = anonymize_records(
+        [{"raw_text": text, "events": events}, {"raw_text": ""}], "ner", 32
+    )
+
+    assert record["auto_anonymized_text"] == "PER_0 left."
+    assert record["auto_anonymized_model"] == "ner"
+    # the event written by the API, after those of the input
+    assert record["events"][0] == events[0]
+    assert record["events"][1]["type"] == "auto_anonymization"
+    assert record["events"][1]["author"] == "offline"
+    assert record["events"][1]["fingerprint"] == record["auto_anonymized_fingerprint"]
+    assert empty == {"raw_text": ""}
+
+
+def test_anonymize_file(tmp_path):
+    # the workers load the flair model
+    pytest.importorskip("flair")
+    text = "The UN is said to meet in New-York according to Donald Trump."
+    input_path = tmp_path / "records.jsonl"
+    output_path = tmp_path / "anonymized.jsonl"
+    records = [
+        {"raw_text": text},
+        {"headline": "no text"},
+        {"raw_text": None},
+        {"raw_text": text},
+    ]
+    input_path.write_text("\n".join(json.dumps(record) for record in records))
+
+    statistics = anonymize_file(
+        str(input_path), str(output_path), model_name="ner", processes=1, chunk_size=2
+    )
+    anonymized = [json.loads(line) for line in output_path.read_text().splitlines()]
+
+    assert statistics["records"] == 4
+    assert statistics["words"] == 2 * len(text.split())
+    assert anonymized[1] == {"headline": "no text"}
+    assert anonymized[2] == {"raw_text": None}
+    assert anonymized[0]["auto_anonymized_text"] == (
+        "The ORG_0 is said to meet in LOC_0 according to PER_0."
+    )
+    assert anonymized[0]["auto_anonymized_model"] == "ner"
+    # the same event as an anonymization by the API
+    [event] = anonymized[0]["events"]
+    assert event["type"] == "auto_anonymization"
+    assert event["fingerprint"] == anonymized[0]["auto_anonymized_fingerprint"]
+
+    anonymize_file(
+        str(input_path), str(output_path), model_name="ner", processes=1, start=3
+    )
+
+    assert len(output_path.read_text().splitlines()) == 5
@@ -0,0 +1,185 @@
+import datetime
+
+import bson
+import pytest
+
+from api import indexes
+from api.pagination import build_cursor_filter
+from api.pagination import decode_cursor
+from api.pagination import encode_cursor
+from api.pagination import get_sort_key
+from api.pagination import parse_sort
+from api.routers import data
+
+
+def test_cursor():
+    article = {
+        "_id": bson.ObjectId(),
+        "date_published": datetime.datetime(2022, 3, 14, 16, 20, 37),
+    }
+    sort = parse_sort("-date_published")
+
+    cursor = encode_cursor(article, sort)
+
+    assert decode_cursor(cursor, sort) == (article["date_published"], article["_id"])
+    assert build_cursor_filter(cursor, sort)["$or"][:2] == [
+        {"date_published": {"$lt": article["date_published"]}},
+        {
+            "date_published": article["date_published"],
+            "_id": {"$lt": article["_id"]},
+        },
+    ]
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, parse_sort("date_published"))
+
+
+def test_cursor_filter_types():
+    object_id = bson.ObjectId()
+    cursor = encode_cursor(
+        {"_id": object_id, "headline": "Paris"}, parse_sort("headline")
+    )
+
+    # the types sorting after strings
+    assert build_cursor_filter(cursor, parse_sort("headline"))["$or"][2] == {
+        "headline": {
+            "$type": [
+                "object",
+                "array",
+                "binData",
+                "objectId",
+                "bool",
+                "date",
+                "timestamp",
+                "regex",
+                "maxKey",
+            ]
+        }
+    }
+
+    sort = parse_sort("-headline")
+    cursor = encode_cursor({"_id": object_id, "headline": 42}, sort)
+
+    # the numbers are followed by the null or missing headlines
+    assert build_cursor_filter(cursor, sort)["$or"][2:] == [
+        {"headline": None},
+        {"headline": {"$type": ["minKey"]}},
+    ]
+
+    cursor = encode_cursor({"_id": object_id}, sort)
+
+    assert decode_cursor(cursor, sort) == (None, object_id)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "W10=", "eyJfaWQiOiAxfQ=="])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, parse_sort("-date_published"))
+
+
+def test_parse_sort():
+    assert parse_sort("headline") == [("headline", 1), ("_id", 1)]
+
+    with pytest.raises(ValueError):
+        parse_sort("-raw_text")
+
+
+class FakeCursor:
+    def __init__(self, articles):
+        self.articles = articles
+        self.read = 0
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.read == len(self.articles):
+            raise StopIteration
+        self.read += 1
+        return self.articles[self.read - 1]
+
+
+class FakeCollection:
+    def __init__(self, articles):
+        self.articles = articles
+        self.cursors = []
+
+    def find(self, filter, projection, sort, limit):
+        articles = sorted(self.articles, key=get_sort_key(sort), reverse=sort[0][1] < 0)
+        self.cursors.append(FakeCursor(articles[: limit or None]))
+        return self.cursors[-1]
+
+
+def test_find_articles(monkeypatch):
+    date = datetime.datetime(2022, 1, 1)
+    collections = {
+        category: FakeCollection(
+            [
+                {"_id": bson.ObjectId(), "date_published": date + delta}
+                for delta in (datetime.timedelta(days=d) for d in days)
+            ]
+        )
+        for category, days in [("sport", [0, 3, 6]), ("health", [1, 4]), ("news", [])]
+    }
+    monkeypatch.setattr(data, "article_db", collections)
+    monkeypatch.setattr(indexes, "QUERY_PLAN_CHECK", "off")
+
+    articles = data.find_articles(
+        list(collections), {}, parse_sort("-date_published"), limit=3
+    )
+
+    assert [a["date_published"].day for a in articles] == [7, 5, 4]
+    # the articles past the limit are not read
+    assert collections["sport"].cursors[0].read <= 2
+
+    articles = data.find_articles(list(collections), {}, parse_sort("date_published"))
+
+    assert [a["date_published"].day for a in articles] == [1, 2, 4, 5, 7]
+
+
+def test_find_articles_mixed_types(monkeypatch):
+    ids = [bson.ObjectId() for _ in range(6)]
+    collections = {
+        "sport": FakeCollection(
+            [
+                {"_id": ids[0], "headline": "Zebra"},
+                {"_id": ids[1], "headline": None},
+                {"_id": ids[2], "headline": datetime.datetime(2022, 1, 1)},
+            ]
+        ),
+        "health": FakeCollection(
+            [
+                {"_id": ids[3], "headline": 42},
+                {"_id": ids[4]},
+                {"_id": ids[5], "headline": "Apple"},
+            ]
+        ),
+    }
+    monkeypatch.setattr(data, "article_db", collections)
+    monkeypatch.setattr(indexes, "QUERY_PLAN_CHECK", "off")
+
+    articles = data.find_articles(list(collections), {}, parse_sort("headline"))
+
+    # null and missing, numbers, strings then dates, as sorted by MongoDB
+    assert [a["_id"] for a in articles] == [
+        ids[1],
+        ids[4],
+        ids[3],
+        ids[5],
+        ids[0],
+        ids[2],
+    ]
+
+    articles = data.find_articles(list(collections), {}, parse_sort("-headline"))
+
+    assert [a["_id"] for a in articles] == [
+        ids[2],
+        ids[0],
+        ids[5],
+        ids[3],
+        ids[4],
+        ids[1],
+    ]
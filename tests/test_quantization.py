@@ -0,0 +1,42 @@
+from conftest import FakeTagger
+
+from api import quantization
+from api.aliasing_model import get_entities
+from api.quantization import entity_agreement
+from api.quantization import load_calibration_texts
+from api.quantization import quantize_if_accurate
+from api.quantization import quantize_tagger
+
+
+def test_quantize_if_accurate(monkeypatch):
+    tagger = FakeTagger()
+    quantized_tagger = FakeTagger()
+    monkeypatch.setattr(quantization, "quantize_tagger", lambda t: quantized_tagger)
+    monkeypatch.setattr(quantization, "entity_agreement", lambda r, t, texts: 0.9)
+
+    assert quantize_if_accurate(tagger, ["text"], min_agreement=0.95) == (tagger, 0.9)
+    assert quantize_if_accurate(tagger, ["text"], min_agreement=0.8) == (
+        quantized_tagger,
+        0.9,
+    )
+    # without calibration texts, the agreement cannot be measured
+    assert quantize_if_accurate(tagger, [], min_agreement=0.8) == (tagger, None)
+
+
+def test_quantized_tagger(ner_tagger):
+    text = "The UN is said to meet in New-York according to Donald Trump."
+    texts = load_calibration_texts("data/records.json")
+    quantized_tagger = quantize_tagger(ner_tagger)
+
+    # the quantized tagger finds the entities of the float tagger
+    assert get_entities(tagger=quantized_tagger, raw_text=text) == get_entities(
+        tagger=ner_tagger, raw_text=text
+    )
+    agreement = entity_agreement(ner_tagger, quantized_tagger, texts)
+    assert agreement >= 0.9
+
+    tagger, measured = quantize_if_accurate(ner_tagger, texts, min_agreement=0.9)
+    assert tagger is not ner_tagger and measured == agreement
+    # below the threshold, the float tagger is kept
+    tagger, measured = quantize_if_accurate(ner_tagger, texts, min_agreement=1.01)
+    assert tagger is ner_tagger and measured == agreement
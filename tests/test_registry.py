@@ -0,0 +1,74 @@
+from conftest import FakeTagger
+
+from api.registry import get_model_size
+from api.registry import ModelRegistry
+
+
+class FakeArray:
+    nbytes = 4096
+
+
+class FakeKeyedVectors:
+    vectors = FakeArray()
+
+
+class FakeWordEmbeddings:
+    precomputed_word_embeddings = FakeKeyedVectors()
+
+
+def make_registry(memory_budget: int):
+    taggers = {}
+
+    def loader(name: str):
+        taggers[name] = FakeTagger(name)
+        return taggers[name], {"model": name}
+
+    return ModelRegistry(loader=loader, memory_budget=memory_budget), taggers
+
+
+def test_registry_loads_on_demand():
+    registry, taggers = make_registry(memory_budget=0)
+
+    with registry.use("ner") as model:
+        assert model.tagger is taggers["ner"]
+        assert model.size == 1024
+
+    with registry.use("ner"):
+        pass
+
+    assert list(taggers) == ["ner"]
+    assert [m["model"] for m in registry.describe()] == ["ner"]
+
+
+def test_model_size():
+    assert get_model_size(FakeTagger("ner")) == 1024
+    # the word vectors are numpy arrays, not parameters
+    assert (
+        get_model_size(FakeTagger("ner", embeddings=[FakeWordEmbeddings()]))
+        == 1024 + 4096
+    )
+
+
+def test_registry_lru_eviction():
+    registry, taggers = make_registry(memory_budget=2048)
+
+    registry.load("a")
+    registry.load("b")
+    registry.load("a")
+    registry.load("c")
+
+    assert [m["model"] for m in registry.describe()] == ["a", "c"]
+    assert taggers["b"].closed
+    assert not taggers["a"].closed
+
+
+def test_registry_keeps_models_in_use():
+    registry, taggers = make_registry(memory_budget=1024)
+
+    with registry.use("a"):
+        registry.load("b")
+
+        assert not taggers["a"].closed
+        assert taggers["b"].closed
+
+    assert [m["model"] for m in registry.describe()] == ["a"]
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from api.scheduler import estimate_cost
+from api.scheduler import InferenceScheduler
+
+
+def _run_in_order(scheduler, requests, wait=0):
+    """Queues the requests while the only slot is busy and returns the order in
+    which they ran"""
+    order = []
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot("interactive"):
+            held.set()
+            release.wait()
+
+    def run(name, lane, cost):
+        with scheduler.slot(lane, cost):
+            order.append(name)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    threads = []
+    for count, (name, lane, cost) in enumerate(requests, 1):
+        thread = threading.Thread(target=run, args=(name, lane, cost))
+        thread.start()
+        threads.append(thread)
+        # each request is queued before the next one
+        while scheduler.depth("interactive") + scheduler.depth("bulk") < count:
+            time.sleep(0.001)
+    time.sleep(wait)
+    release.set()
+
+    for thread in [holder] + threads:
+        thread.join()
+    return order
+
+
+def test_estimate_cost():
+    assert estimate_cost(["Paul lives in Paris.", "Hello"]) == 5
+
+
+def test_scheduler_priorities():
+    scheduler = InferenceScheduler(slots=1, starvation_deadline=60)
+    order = _run_in_order(
+        scheduler,
+        [
+            ("article", "bulk", 10000),
+            ("long", "interactive", 500),
+            ("short", "interactive", 20),
+        ],
+    )
+
+    assert order == ["short", "long", "article"]
+    assert scheduler.depth("interactive") == scheduler.depth("bulk") == 0
+
+
+def test_scheduler_starvation():
+    scheduler = InferenceScheduler(slots=1, starvation_deadline=0.05)
+    order = _run_in_order(
+        scheduler,
+        [("article", "bulk", 10000), ("short", "interactive", 20)],
+        wait=0.1,
+    )
+
+    # the article waited past the deadline while the slot was busy
+    assert order == ["article", "short"]
+
+
+def test_scheduler_unknown_lane():
+    scheduler = InferenceScheduler()
+
+    with pytest.raises(ValueError):
+        with scheduler.slot("background"):
+            pass
@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api.singleflight import COALESCED_REQUESTS
+from api.singleflight import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight("test")
+    calls = []
+    barrier = threading.Barrier(5)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"UN": "ORG_0"}
+
+    def call(_):
+        barrier.wait()
+        return flights.do("key", compute)
+
+    coalesced = COALESCED_REQUESTS.labels("test")._value.get()
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(call, range(5)))
+
+    assert results == [{"UN": "ORG_0"}] * 5
+    assert len(calls) == 1
+    assert COALESCED_REQUESTS.labels("test")._value.get() == coalesced + 4
+
+    flights.do("key", compute)
+
+    assert len(calls) == 2
+
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight("test_errors")
+
+    def compute():
+        raise ValueError("model failure")
+
+    with pytest.raises(ValueError):
+        flights.do("key", compute)
+
+    assert flights.do("key", lambda: 1) == 1
@@ -0,0 +1,77 @@
+from api import stamps
+from api.routers import data
+from api.stamps import build_stale_filter
+from api.stamps import get_model_fingerprint
+from api.stamps import get_stamp
+from api.stamps import get_text_hash
+from api.stamps import is_up_to_date
+
+
+def test_model_fingerprint():
+    assert get_model_fingerprint("ner") == get_model_fingerprint("ner")
+    assert get_model_fingerprint("ner") != get_model_fingerprint("ner-fast")
+
+
+def test_quantized_model_fingerprint(monkeypatch):
+    monkeypatch.setattr(stamps, "INFERENCE_QUANTIZE", True)
+    monkeypatch.setattr(stamps, "_quantized_models", {})
+    fingerprint = get_model_fingerprint("ner")
+
+    assert not stamps.is_model_state_known("ner")
+
+    # the quantized model did not agree enough with the float model
+    stamps.record_model_state("ner", {"model": "ner", "quantized": False})
+
+    assert stamps.is_model_state_known("ner")
+    assert get_model_fingerprint("ner") == fingerprint
+
+    stamps.record_model_state("ner", {"model": "ner", "quantized": True})
+
+    assert get_model_fingerprint("ner") != fingerprint
+
+
+def test_is_up_to_date():
+    raw_text = "The UN is said to meet in New-York according to Donald Trump."
+    article = {"raw_text": raw_text, **get_stamp(raw_text, "ner")}
+
+    assert is_up_to_date(article, "ner")
+    assert not is_up_to_date(article, "ner-fast")
+    assert not is_up_to_date({**article, "raw_text": "Donald Trump left."}, "ner")
+    assert not is_up_to_date({"raw_text": raw_text}, "ner")
+
+
+def test_stale_filter():
+    stale_filter = build_stale_filter("ner")
+
+    assert stale_filter == {
+        "auto_anonymized_fingerprint": {"$ne": get_model_fingerprint("ner")}
+    }
+    assert get_text_hash("a") != get_text_hash("b")
+
+
+def test_auto_anonymize_fields_reuses_same_fingerprint(monkeypatch):
+    raw_text = "The UN is said to meet in New-York according to Donald Trump."
+    sentences = [{"text": raw_text, "entities": []}]
+    calls = []
+
+    def compute_entities_incremental(raw_text, previous_sentences, model_name):
+        calls.append(previous_sentences)
+        return {}, sentences
+
+    monkeypatch.setattr(data, "load_model_state", lambda model_name: None)
+    monkeypatch.setattr(
+        data, "compute_entities_incremental", compute_entities_incremental
+    )
+    article = {
+        "raw_text": raw_text,
+        "auto_anonymized_model": "ner",
+        "auto_anonymized_sentences": sentences,
+        **get_stamp(raw_text, "ner"),
+    }
+
+    data.auto_anonymize_fields(raw_text, "ner", previous_article=article)
+    # tagged with an older model or code, the article is fully tagged again
+    old_article = {**article, "auto_anonymized_fingerprint": "0" * 32}
+    data.auto_anonymize_fields(raw_text, "ner", previous_article=old_article)
+
+    assert calls == [sentences, []]
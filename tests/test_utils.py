@@ -0,0 +1,18 @@
+import pytest
+
+from api.utils import build_projection
+from api.utils import parse_fields
+
+
+def test_parse_fields():
+    fields = parse_fields(["headline,date_published", " section ", "object_id"])
+
+    assert fields == ["headline", "date_published", "section", "object_id"]
+    assert build_projection(fields) == {
+        "headline": 1,
+        "date_published": 1,
+        "section": 1,
+    }
+
+    with pytest.raises(ValueError):
+        parse_fields(["headline,password"])
@@ -0,0 +1,38 @@
+import pytest
+
+from api.workers import WorkerPool
+
+# the workers load the flair model
+pytest.importorskip("flair")
+
+text1 = "The UN is said to meet in New-York according to Donald Trump."
+
+entities1 = {"UN": "ORG_0", "New-York": "LOC_0", "Donald Trump": "PER_0"}
+
+
+def test_worker_pool():
+    pool = WorkerPool(model_name="ner", processes=1)
+
+    try:
+        entities = pool.get_entities(text1, ["LOC", "PER", "ORG"])
+    finally:
+        pool.shutdown()
+
+    assert entities == entities1
+
+
+def test_worker_pool_models():
+    pool = WorkerPool(model_name="ner", processes=2)
+
+    try:
+        info = pool.load_model("ner")
+        models = pool.get_models()
+    finally:
+        pool.shutdown()
+
+    assert info["model"] == "ner"
+    # every worker loaded the model
+    assert sorted((m["worker"], m["model"]) for m in models) == [
+        (0, "ner"),
+        (1, "ner"),
+    ]